@@ -1,20 +1,19 @@
 import imaplib
 import email
 import time
-import asyncio
+import concurrent.futures
+import threading
 import logging
 import requests
 from email.header import decode_header
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set
 
 from app.core.config import settings
 from app.adapters.email.utils import sanitize_email_body
-from app.repositories.message import MessageRepository
-from app.api.dependencies import get_orchestrator
-from app.schemas.models import IncomingMessage
+from app.api.dependencies import get_orchestrator, get_dispatcher, get_dedup
+from app.schemas.models import InboundMessage
 
 logger = logging.getLogger("email.listener")
-repo = MessageRepository()
 
 import msal
 _token_cache: Dict[str, Any] = {}
@@ -42,6 +41,32 @@ def get_graph_token() -> Optional[str]:
     except Exception: 
         return None
 
+def _wait(future: concurrent.futures.Future):
+    # A stuck main loop or a full partition must not hold the poller forever.
+    try:
+        return future.result(timeout=settings.DISPATCH_EMAIL_TIMEOUT_SECONDS)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+def _claim_new(message_ids: List[str]) -> Set[str]:
+    # Dedups a whole poll at once. The async DB pool belongs to the main loop, so the claim is run there.
+    if not message_ids:
+        return set()
+    try:
+        return _wait(get_dispatcher().call_threadsafe(get_dedup().claim, "email", message_ids))
+    except Exception:
+        # The claim may still land after we gave up on it.
+        _release(message_ids)
+        raise
+
+def _release(message_ids: List[str]):
+    # Gives the claim back so the next poll picks the email up again.
+    try:
+        _wait(get_dispatcher().call_threadsafe(get_dedup().release, "email", message_ids))
+    except Exception as e:
+        logger.error(f"Failed to release email claims {message_ids}: {e}")
+
 def _mark_graph_read(user_id, message_id, token):
     url = f"https://graph.microsoft.com/v1.0/users/{user_id}/messages/{message_id}"
     try:
@@ -49,20 +74,18 @@ def _mark_graph_read(user_id, message_id, token):
     except Exception: 
         pass
 
-def _process_graph_message(user_id, msg, token):
+def _process_graph_message(user_id, msg, token, claimed: Set[str]):
     graph_id = msg.get("id")
     azure_conv_id = msg.get("conversationId") 
     
     if not graph_id: 
         return
 
-    if repo.is_processed(graph_id, "email"):
+    if graph_id not in claimed:
         logger.warning(f"DUPLIKASI DITOLAK: {graph_id}. Menandai sebagai Read.")
         _mark_graph_read(user_id, graph_id, token)
         return
 
-    _mark_graph_read(user_id, graph_id, token)
-
     clean_body = _extract_graph_body(msg)
     sender_info = msg.get("from", {}).get("emailAddress", {})
     
@@ -73,7 +96,10 @@ def _process_graph_message(user_id, msg, token):
         "conversation_id": azure_conv_id 
     }
 
-    process_single_email(sender_info.get("address", ""), clean_body, metadata)
+    if process_single_email(sender_info.get("address", ""), clean_body, metadata):
+        _mark_graph_read(user_id, graph_id, token)
+    else:
+        _release([graph_id])
 
 def _extract_graph_body(msg):
     body_content = msg.get("body", {}).get("content", "")
@@ -90,8 +116,10 @@ def _poll_graph_api():
     try:
         resp = requests.get(url, headers={"Authorization": f"Bearer {token}"}, params=params, timeout=20)
         if resp.status_code == 200:
-            for msg in resp.json().get("value", []):
-                _process_graph_message(user_id, msg, token)
+            messages = resp.json().get("value", [])
+            claimed = _claim_new([msg["id"] for msg in messages if msg.get("id")])
+            for msg in messages:
+                _process_graph_message(user_id, msg, token, claimed)
     except Exception as e:
         logger.error(f"Graph Polling Error: {e}")
 
@@ -111,7 +139,20 @@ def _connect_gmail_imap():
         logger.error(f"IMAP Connection Error: {e}")
         return None
 
-def _process_gmail_message(mail, msg_id):
+def _fetch_gmail_message_ids(mail, msg_ids) -> List[str]:
+    # Headers only (PEEK keeps them unread), so duplicates are skipped without downloading bodies.
+    status, data = mail.fetch(b",".join(msg_ids), "(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])")
+    if status != "OK":
+        return []
+    found = []
+    for part in data:
+        if isinstance(part, tuple):
+            message_id = email.message_from_bytes(part[1]).get("Message-ID", "").strip()
+            if message_id:
+                found.append(message_id)
+    return found
+
+def _process_gmail_message(mail, msg_id, claimed: Set[str]):
     try:
         status, msg_data = mail.fetch(msg_id, "(RFC822)")
         
@@ -127,7 +168,8 @@ def _process_gmail_message(mail, msg_id):
             logger.warning(f"Email {msg_id} has no Message-ID, skipping")
             return
         
-        if repo.is_processed(message_id, "email"):
+        # Ids already decided by the batch claim are answered from the dedup memory tier.
+        if message_id not in claimed and not _claim_new([message_id]):
             logger.debug(f"Email {message_id[:30]}... already processed")
             mail.store(msg_id, '+FLAGS', '\\Seen')
             return
@@ -207,8 +249,10 @@ def _process_gmail_message(mail, msg_id):
         
         logger.info(f"Processing email from {sender_email}: {subject[:50]}")
         
-        # Process the email
-        process_single_email(sender_email, clean_body, metadata)
+        # Process the email; if it could not be queued, leave it unseen for the next poll.
+        if not process_single_email(sender_email, clean_body, metadata):
+            _release([message_id])
+            mail.store(msg_id, '-FLAGS', '\\Seen')
         
     except Exception as e:
         logger.error(f"Error processing Gmail message {msg_id}: {e}")
@@ -239,9 +283,10 @@ def _poll_gmail_imap():
         
         if unread_ids:
             logger.info(f"Found {len(unread_ids)} unread email(s)")
+            claimed = _claim_new(_fetch_gmail_message_ids(mail, unread_ids))
             
             for msg_id in unread_ids:
-                _process_gmail_message(mail, msg_id)
+                _process_gmail_message(mail, msg_id, claimed)
                 
                 time.sleep(0.5)
         else:
@@ -255,33 +300,35 @@ def _poll_gmail_imap():
         except:
             pass
 
-def process_single_email(sender_email, body, metadata: dict):
+def process_single_email(sender_email, body, metadata: dict) -> bool:
+    # False only when the email could not be handed to the dispatcher.
     if "mailer-daemon" in sender_email.lower() or "noreply" in sender_email.lower(): 
-        return
+        return True
 
-    msg = IncomingMessage(
+    msg = InboundMessage(
         platform_unique_id=sender_email,
         query=body,
         platform="email",
+        message_id=metadata.get("message_id"),
         metadata=metadata
     )
     
     try:
         orchestrator = get_orchestrator()
-        try: 
-            loop = asyncio.get_event_loop()
-        except RuntimeError: 
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        loop.run_until_complete(orchestrator.process_message(msg))
-        logger.info(f"✓ Email processed: {sender_email}")
+        # Blocks this thread until the main loop accepts the job, which throttles polling under load.
+        _wait(get_dispatcher().submit_threadsafe(
+            orchestrator.dispatch_key(msg), orchestrator.process_message, msg,
+            timeout=settings.DISPATCH_EMAIL_TIMEOUT_SECONDS
+        ))
+        logger.info(f"✓ Email queued: {sender_email}")
+        return True
     except Exception as err:
         logger.error(f"Internal Process Error: {err}")
         import traceback
         traceback.print_exc()
+        return False
 
-def start_email_listener():
+def start_email_listener(stop: Optional[threading.Event] = None):
     if not settings.EMAIL_USER and not settings.AZURE_CLIENT_ID: 
         logger.warning("No email credentials configured")
         return
@@ -289,7 +336,8 @@ def start_email_listener():
     provider = settings.EMAIL_PROVIDER
     logger.info(f"Starting Email Listener (Provider: {provider})")
     
-    while True:
+    stop = stop or threading.Event()
+    while not stop.is_set():
         try:
             if provider == "azure_oauth2":
                 _poll_graph_api()
@@ -301,4 +349,6 @@ def start_email_listener():
         except Exception as e:
             logger.error(f"Email listener error: {e}")
         
-        time.sleep(settings.EMAIL_POLL_INTERVAL_SECONDS)
\ No newline at end of file
+        stop.wait(settings.EMAIL_POLL_INTERVAL_SECONDS)
+
+    logger.info("Email Listener stopped")
\ No newline at end of file
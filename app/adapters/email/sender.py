@@ -1,5 +1,4 @@
 import smtplib
-import httpx
 import logging
 import time
 import re
@@ -10,6 +9,7 @@ from email.utils import make_msgid
 from typing import Optional, Dict, Any
 
 from app.core.config import settings
+from app.core.http import HttpClients
 from app.adapters.base import BaseAdapter
 
 logger = logging.getLogger("adapters.email")
@@ -81,44 +81,45 @@ class EmailAdapter(BaseAdapter):
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient(timeout=10) as client:
-            if graph_message_id:
-                logger.info(f"Replying to existing thread using Graph ID: {graph_message_id}")
-                url = f"https://graph.microsoft.com/v1.0/users/{user_id}/messages/{graph_message_id}/reply"
-                payload = {"comment": html_body}
-                try:
-                    response = await client.post(url, json=payload, headers=headers)
-                    if response.status_code == 202:
-                        return {"sent": True, "method": "azure_graph_reply"}
-                    else:
-                        logger.error(f"Graph Reply Failed ({response.status_code}): {response.text}")
-                        return {"sent": False, "error": f"Reply failed: {response.text}"}
-                except Exception as e:
-                    logger.error(f"Graph Reply Exception: {e}")
-                    return {"sent": False, "error": str(e)}
-
-            url = f"https://graph.microsoft.com/v1.0/users/{user_id}/sendMail"
-            email_msg = {
-                "message": {
-                    "subject": subject,
-                    "body": {"contentType": "HTML", "content": html_body},
-                    "toRecipients": [{"emailAddress": {"address": to_email}}]
-                },
-                "saveToSentItems": "true"
-            }
-
+        client = HttpClients.for_url("https://graph.microsoft.com")
+        timeout = settings.GRAPH_REQUEST_TIMEOUT_SECONDS
+        if graph_message_id:
+            logger.info(f"Replying to existing thread using Graph ID: {graph_message_id}")
+            url = f"https://graph.microsoft.com/v1.0/users/{user_id}/messages/{graph_message_id}/reply"
+            payload = {"comment": html_body}
             try:
-                response = await client.post(url, json=email_msg, headers=headers)
+                response = await client.post(url, json=payload, headers=headers, timeout=timeout)
                 if response.status_code == 202:
-                    logger.info(f"Email sent via Azure sendMail to {to_email}")
-                    return {"sent": True, "method": "azure_graph_send"}
+                    return {"sent": True, "method": "azure_graph_reply"}
                 else:
-                    logger.error(f"Graph API Error {response.status_code}: {response.text}")
-                    return {"sent": False, "error": response.text}
+                    logger.error(f"Graph Reply Failed ({response.status_code}): {response.text}")
+                    return {"sent": False, "error": f"Reply failed: {response.text}"}
             except Exception as e:
-                logger.error(f"Graph API Exception: {e}")
+                logger.error(f"Graph Reply Exception: {e}")
                 return {"sent": False, "error": str(e)}
 
+        url = f"https://graph.microsoft.com/v1.0/users/{user_id}/sendMail"
+        email_msg = {
+            "message": {
+                "subject": subject,
+                "body": {"contentType": "HTML", "content": html_body},
+                "toRecipients": [{"emailAddress": {"address": to_email}}]
+            },
+            "saveToSentItems": "true"
+        }
+
+        try:
+            response = await client.post(url, json=email_msg, headers=headers, timeout=timeout)
+            if response.status_code == 202:
+                logger.info(f"Email sent via Azure sendMail to {to_email}")
+                return {"sent": True, "method": "azure_graph_send"}
+            else:
+                logger.error(f"Graph API Error {response.status_code}: {response.text}")
+                return {"sent": False, "error": response.text}
+        except Exception as e:
+            logger.error(f"Graph API Exception: {e}")
+            return {"sent": False, "error": str(e)}
+
     def _send_via_smtp(self, to_email, subject, html_body, in_reply_to, references):
         try:
             msg = MIMEMultipart()
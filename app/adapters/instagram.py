@@ -46,7 +46,7 @@ class InstagramAdapter(BaseAdapter):
             else:
                 logger.error(f"[Instagram API] Message failed: {status} - {res.get('data')}")
             
-        return {"sent": True, "results": results}
+        return {"sent": bool(results) and all(r.get("success") for r in results), "results": results}
 
     async def send_feedback_request(self, recipient_id: str, answer_id: int):
         if not self.token: return {"success": False}
@@ -1,5 +1,6 @@
-import httpx
 import logging
+from app.core.config import settings
+from app.core.http import HttpClients
 
 logger = logging.getLogger("adapters.utils")
 
@@ -28,17 +29,51 @@ def split_text_smartly(text: str, max_length: int = 4096) -> list[str]:
     
     return chunks
 
+class ParagraphAccumulator:
+    # Buffers streamed answer text and releases it at paragraph boundaries, so users
+    # get readable messages rather than one bubble per token chunk.
+    def __init__(self, min_length: int = 280, max_length: int = 1000):
+        self.min_length = min_length
+        self.max_length = max(max_length, min_length)
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self._buffer += text
+        ready = []
+
+        while len(self._buffer) >= self.min_length:
+            boundary = self._buffer.rfind("\n\n", self.min_length - 1, self.max_length)
+            if boundary != -1:
+                ready.append(self._buffer[:boundary].strip())
+                self._buffer = self._buffer[boundary + 2:]
+                continue
+
+            if len(self._buffer) <= self.max_length:
+                break
+
+            self._buffer = self._buffer.lstrip()
+            head, *_ = split_text_smartly(self._buffer, self.max_length)
+            ready.append(head)
+            self._buffer = self._buffer[len(head):].lstrip()
+
+        return [chunk for chunk in ready if chunk]
+
+    def flush(self) -> list[str]:
+        remaining, self._buffer = self._buffer.strip(), ""
+        return split_text_smartly(remaining, self.max_length) if remaining else []
+
 async def make_meta_request(method: str, url: str, token: str, payload: dict = None) -> dict:
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            if method.upper() == "POST":
-                resp = await client.post(url, json=payload, headers=headers)
-            else:
-                resp = await client.get(url, headers=headers)
+        client = HttpClients.for_url(url)
+        timeout = settings.META_REQUEST_TIMEOUT_SECONDS
+        if method.upper() == "POST":
+            resp = await client.post(url, json=payload, headers=headers, timeout=timeout)
+        else:
+            resp = await client.get(url, headers=headers, timeout=timeout)
             
         return {
             "success": resp.is_success,
@@ -34,7 +34,7 @@ class WhatsAppAdapter(BaseAdapter):
             res = await make_meta_request("POST", self.base_url, self.token, payload)
             results.append(res)
         
-        return {"sent": True, "results": results}
+        return {"sent": bool(results) and all(r.get("success") for r in results), "results": results}
 
     async def send_typing_on(self, recipient_id: str, message_id: str = None):
         if not self.token: return
@@ -1,17 +1,100 @@
 from app.repositories.conversation import ConversationRepository
-from app.repositories.message import MessageRepository
+from app.repositories.message import MessageRepository, CachedMessageRepository
+from app.repositories.outbox import OutboxRepository
+from app.repositories.write_behind import WriteBehindBuffer
 from app.services.chatbot import ChatbotClient
 from app.services.orchestrator import MessageOrchestrator
 from app.adapters.whatsapp import WhatsAppAdapter
 from app.adapters.instagram import InstagramAdapter
 from app.adapters.email.sender import EmailAdapter
+from app.services.dispatcher import MessageDispatcher
+from app.services.coalescer import MessageCoalescer
+from app.services.outbox import OutboxWorker
+from app.services.conversation_cache import ConversationStateCache
+from app.services.dedup import DedupService
+from app.services.session_timer import SessionTimer
+from app.core.config import settings
 
 _wa_adapter = WhatsAppAdapter()
 _ig_adapter = InstagramAdapter()
 _email_adapter = EmailAdapter()
 _chatbot_client = ChatbotClient()
-_repo_conv = ConversationRepository()
-_repo_msg = MessageRepository()
+_writer = WriteBehindBuffer(
+    max_rows=settings.WRITE_BEHIND_MAX_ROWS,
+    max_delay=settings.WRITE_BEHIND_MAX_DELAY_MS / 1000
+)
+_repo_conv = ConversationRepository(writer=_writer)
+_repo_msg = (
+    CachedMessageRepository(
+        max_entries=settings.EMAIL_METADATA_CACHE_MAX_ENTRIES,
+        ttl=settings.EMAIL_METADATA_CACHE_TTL_SECONDS,
+        writer=_writer
+    )
+    if settings.EMAIL_METADATA_CACHE_ENABLED else MessageRepository(writer=_writer)
+)
+_dispatcher = MessageDispatcher(
+    workers=settings.DISPATCH_WORKERS,
+    queue_size=settings.DISPATCH_QUEUE_SIZE
+)
+_outbox = OutboxWorker(
+    repo=OutboxRepository(),
+    chatbot=_chatbot_client,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+    lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    max_backoff_seconds=settings.OUTBOX_MAX_BACKOFF_SECONDS
+)
+if settings.OUTBOX_ENABLED:
+    _chatbot_client.attach_outbox(_outbox)
+
+_coalescer = MessageCoalescer(
+    window=settings.COALESCE_WINDOW_SECONDS,
+    max_wait=settings.COALESCE_MAX_WAIT_SECONDS,
+    max_messages=settings.COALESCE_MAX_MESSAGES,
+    max_chars=settings.MAX_INPUT_CHARS,
+    dispatcher=_dispatcher,
+    enqueue_timeout=settings.DISPATCH_ENQUEUE_TIMEOUT_SECONDS
+)
+
+_state_cache = ConversationStateCache(
+    max_entries=settings.CONVERSATION_CACHE_MAX_ENTRIES,
+    ttl=settings.CONVERSATION_CACHE_TTL_SECONDS
+)
+
+_dedup = DedupService(repo=_repo_msg, max_entries=settings.DEDUP_CACHE_SIZE)
+
+_session_timer = SessionTimer(
+    timeout_seconds=settings.SESSION_TIMEOUT_MINUTES * 60,
+    tick=settings.SESSION_TIMER_TICK_SECONDS
+)
+
+def get_chatbot() -> ChatbotClient:
+    return _chatbot_client
+
+def get_outbox() -> OutboxWorker:
+    return _outbox
+
+def get_dispatcher() -> MessageDispatcher:
+    return _dispatcher
+
+def get_coalescer() -> MessageCoalescer:
+    return _coalescer
+
+def get_state_cache() -> ConversationStateCache:
+    return _state_cache
+
+def get_dedup() -> DedupService:
+    return _dedup
+
+def get_message_repo() -> MessageRepository:
+    return _repo_msg
+
+def get_writer() -> WriteBehindBuffer:
+    return _writer
+
+def get_session_timer() -> SessionTimer:
+    return _session_timer
 
 def get_orchestrator() -> MessageOrchestrator:
     adapters = {
@@ -23,5 +106,8 @@ def get_orchestrator() -> MessageOrchestrator:
         repo_conv=_repo_conv,
         repo_msg=_repo_msg,
         chatbot=_chatbot_client,
-        adapters=adapters
+        adapters=adapters,
+        coalescer=_coalescer,
+        state_cache=_state_cache if settings.CONVERSATION_CACHE_ENABLED else None,
+        session_timer=_session_timer if settings.SESSION_TIMER_ENABLED else None
     )
\ No newline at end of file
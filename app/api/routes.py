@@ -1,17 +1,47 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, BackgroundTasks, Request, Query, Response, HTTPException
 from app.core.config import settings
-from app.schemas.models import IncomingMessage
-from app.api.dependencies import get_orchestrator
+from app.schemas.models import IncomingMessage, InboundMessage
+from app.api.dependencies import get_orchestrator, get_dispatcher, get_coalescer, get_chatbot, get_outbox, get_state_cache, get_dedup, get_message_repo, get_writer
 from app.api.auth import verify_api_key
 from app.services.orchestrator import MessageOrchestrator
-from app.services.parsers import parse_whatsapp_payload, parse_instagram_payload
-from app.repositories.message import MessageRepository
+from app.services.dispatcher import MessageDispatcher
+from app.services.dedup import DedupService
+from app.services.scheduler import get_scheduler
+from app.services.leader import get_leader_stats
+from app.core.exceptions import QueueFullError
+from app.core.http import HttpClients
+from app.repositories.base import Database
+from app.services.parsers import parse_whatsapp_payload, parse_instagram_payload, decode_body
+from app.services import prefilter
 import logging
 
 logger = logging.getLogger("api.routes")
 router = APIRouter()
 
-_msg_repo = MessageRepository()
+async def _dispatch_events(
+    dispatcher: MessageDispatcher,
+    orchestrator: MessageOrchestrator,
+    messages: list,
+    dedup: Optional[DedupService] = None
+):
+    if dedup:
+        messages = await dedup.filter_messages(messages)
+        if not messages:
+            return
+
+    await orchestrator.prefetch_conversation_states(messages)
+    for index, msg in enumerate(messages):
+        try:
+            await dispatcher.submit(
+                orchestrator.dispatch_key(msg), orchestrator.handle_event, msg,
+                timeout=settings.DISPATCH_ENQUEUE_TIMEOUT_SECONDS
+            )
+        except QueueFullError as e:
+            logger.warning(f"Backpressure: {e}")
+            if dedup:
+                await dedup.release_messages(messages[index:])
+            raise HTTPException(status_code=503, detail="Busy, retry later", headers={"Retry-After": "5"})
 
 @router.get("/whatsapp/webhook")
 def verify_whatsapp(
@@ -36,36 +66,38 @@ def verify_instagram(
 @router.post("/whatsapp/webhook")
 async def whatsapp_webhook(
     request: Request,
-    bg_tasks: BackgroundTasks,
-    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
+    orchestrator: MessageOrchestrator = Depends(get_orchestrator),
+    dispatcher: MessageDispatcher = Depends(get_dispatcher),
+    dedup: DedupService = Depends(get_dedup)
 ):
-    data = await request.json()
-    msg = parse_whatsapp_payload(data)
+    body = await request.body()
+    if prefilter.should_drop("whatsapp", body):
+        return {"status": "ok"}
+
+    data = decode_body(body)
+    messages = parse_whatsapp_payload(data)
     
-    if msg:
-        if msg.metadata and msg.metadata.get("is_feedback"):
-            logger.info(f"Feedback Event Received (WA): {msg.metadata['payload']}")
-            bg_tasks.add_task(orchestrator.handle_feedback, msg)
-        else:
-            bg_tasks.add_task(orchestrator.process_message, msg)
+    if messages:
+        await _dispatch_events(dispatcher, orchestrator, messages, dedup)
             
     return {"status": "ok"}
 
 @router.post("/instagram/webhook")
 async def instagram_webhook(
     request: Request,
-    bg_tasks: BackgroundTasks,
-    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
+    orchestrator: MessageOrchestrator = Depends(get_orchestrator),
+    dispatcher: MessageDispatcher = Depends(get_dispatcher),
+    dedup: DedupService = Depends(get_dedup)
 ):
-    data = await request.json()
-    msg = parse_instagram_payload(data)
+    body = await request.body()
+    if prefilter.should_drop("instagram", body):
+        return {"status": "ok"}
+
+    data = decode_body(body)
+    messages = parse_instagram_payload(data)
     
-    if msg:
-        if msg.metadata and msg.metadata.get("is_feedback"):
-            logger.info(f"Feedback Event Received (IG): {msg.metadata['payload']}")
-            bg_tasks.add_task(orchestrator.handle_feedback, msg)
-        else:
-            bg_tasks.add_task(orchestrator.process_message, msg)
+    if messages:
+        await _dispatch_events(dispatcher, orchestrator, messages, dedup)
             
     return {"status": "ok"}
 
@@ -82,18 +114,109 @@ async def receive_backend_reply(
     
     return {"status": "processed"}
 
+async def _iter_stream_events(request: Request):
+    is_sse = "text/event-stream" in request.headers.get("content-type", "")
+    buffer = b""
+
+    def parse_line(line: bytes):
+        line = line.strip()
+        if is_sse:
+            if not line.startswith(b"data:"):
+                return None
+            line = line[5:].strip()
+            if line == b"[DONE]":
+                return None
+        if not line:
+            return None
+        event = decode_body(line)
+        return event if isinstance(event, dict) else None
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            event = parse_line(line)
+            if event is not None:
+                yield event
+
+    event = parse_line(buffer)
+    if event is not None:
+        yield event
+
+@router.post("/api/send/reply/stream", dependencies=[Depends(verify_api_key)])
+async def receive_backend_reply_stream(
+    request: Request,
+    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
+):
+    result = await orchestrator.relay_stream(
+        _iter_stream_events(request),
+        min_chars=settings.STREAM_MIN_SEGMENT_CHARS,
+        max_chars=settings.STREAM_MAX_SEGMENT_CHARS
+    )
+    return {"status": "processed", **result}
+
+@router.post("/api/send/replies", dependencies=[Depends(verify_api_key)])
+async def receive_backend_replies(
+    request: Request,
+    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
+):
+    try:
+        data = decode_body(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid JSON body")
+    items = data.get("replies") if isinstance(data, dict) else data
+    
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Expected a list of replies")
+    if len(items) > settings.REPLY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.REPLY_BATCH_MAX_ITEMS} replies")
+
+    logger.info(f"Received batch reply callback from Backend: {len(items)} items")
+    results = await orchestrator.send_reply_batch(items, concurrency=settings.REPLY_BATCH_CONCURRENCY)
+    
+    return {
+        "status": "processed",
+        "sent": sum(1 for r in results if r["status"] == "sent"),
+        "results": results
+    }
+
 @router.post("/api/messages/process", dependencies=[Depends(verify_api_key)])
 async def process_message_internal(
     msg: IncomingMessage,
-    bg_tasks: BackgroundTasks,
-    orchestrator: MessageOrchestrator = Depends(get_orchestrator)
+    orchestrator: MessageOrchestrator = Depends(get_orchestrator),
+    dispatcher: MessageDispatcher = Depends(get_dispatcher),
+    dedup: DedupService = Depends(get_dedup)
 ):
+    unique_id = None
     if msg.platform == "email" and msg.metadata:
         unique_id = msg.metadata.get("graph_message_id") or msg.metadata.get("message_id")
         
-        if unique_id and _msg_repo.is_processed(unique_id, "email"):
+        if unique_id and not await dedup.claim("email", [unique_id]):
             logger.info(f"Duplicate email blocked: {unique_id}")
             return {"status": "duplicate", "message": "Already processed"}
     
-    bg_tasks.add_task(orchestrator.process_message, msg)
-    return {"status": "queued"}
\ No newline at end of file
+    try:
+        await _dispatch_events(dispatcher, orchestrator, [InboundMessage.from_model(msg)])
+    except HTTPException:
+        if unique_id:
+            await dedup.release("email", [unique_id])
+        raise
+    return {"status": "queued"}
+
+@router.get("/api/metrics", dependencies=[Depends(verify_api_key)])
+async def metrics(dispatcher: MessageDispatcher = Depends(get_dispatcher)):
+    return {
+        "webhook_filter": prefilter.get_stats(),
+        "dispatcher": dispatcher.get_stats(),
+        "coalescer": get_coalescer().get_stats(),
+        "http": HttpClients.get_stats(),
+        "backend": get_chatbot().get_stats(),
+        "outbox": get_outbox().get_stats(),
+        "conversation_cache": get_state_cache().get_stats(),
+        "dedup": get_dedup().get_stats(),
+        "email_metadata_cache": get_message_repo().get_stats() if settings.EMAIL_METADATA_CACHE_ENABLED else None,
+        "write_behind": get_writer().get_stats(),
+        "session_timeouts": get_scheduler().get_stats(),
+        "leadership": get_leader_stats(),
+        "database": Database.get_stats()
+    }
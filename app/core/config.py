@@ -8,6 +8,9 @@ class Settings(BaseSettings):
     APP_NAME: str = "Multikarnal Orchestrator"
     LOG_LEVEL: str = "INFO"
     ENABLE_BACKGROUND_WORKER: bool = True 
+    LEADER_ELECTION_ENABLED: bool = True
+    LEADER_RETRY_INTERVAL_SECONDS: float = 5.0
+    LEADER_HEARTBEAT_INTERVAL_SECONDS: float = 5.0
     X_API_KEY: Optional[str] = None 
 
     # Backend API Configuration
@@ -18,12 +21,112 @@ class Settings(BaseSettings):
     EMAIL_POLL_INTERVAL_SECONDS: int = 15
     MAX_INPUT_CHARS: int = 6000
 
+    # Message Dispatch
+    DISPATCH_WORKERS: int = 8
+    DISPATCH_QUEUE_SIZE: int = 200
+    DISPATCH_ENQUEUE_TIMEOUT_SECONDS: float = 2.0
+    DISPATCH_DRAIN_TIMEOUT_SECONDS: float = 10.0
+    DISPATCH_EMAIL_TIMEOUT_SECONDS: float = 30.0
+
+    # Message Coalescing (0 disables)
+    COALESCE_WINDOW_SECONDS: float = 1.5
+    COALESCE_MAX_WAIT_SECONDS: float = 6.0
+    COALESCE_MAX_MESSAGES: int = 8
+
+    # Batch Reply Callbacks
+    REPLY_BATCH_MAX_ITEMS: int = 500
+    REPLY_BATCH_CONCURRENCY: int = 32
+
+    # Streaming Replies
+    STREAM_MIN_SEGMENT_CHARS: int = 280
+    STREAM_MAX_SEGMENT_CHARS: int = 1000
+
+    # Outbound HTTP
+    HTTP2_ENABLED: bool = False
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_DEFAULT_TIMEOUT_SECONDS: float = 10.0
+    META_REQUEST_TIMEOUT_SECONDS: float = 10.0
+    GRAPH_REQUEST_TIMEOUT_SECONDS: float = 10.0
+    BACKEND_ASK_TIMEOUT_SECONDS: float = 120.0
+    BACKEND_FEEDBACK_TIMEOUT_SECONDS: float = 10.0
+
+    # Backend Concurrency (adaptive)
+    BACKEND_CONCURRENCY_INITIAL: int = 16
+    BACKEND_CONCURRENCY_MIN: int = 2
+    BACKEND_CONCURRENCY_MAX: int = 128
+    BACKEND_LATENCY_TARGET_SECONDS: float = 45.0
+    BACKEND_MAX_QUEUE: int = 1000
+
+    # Overload Protection
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_TIMEOUT_SECONDS: float = 30.0
+    OVERLOAD_QUEUE_THRESHOLD: int = 200
+
+    # Backend Outbox
+    OUTBOX_ENABLED: bool = False
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_LEASE_SECONDS: float = 180.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_MAX_BACKOFF_SECONDS: float = 300.0
+
+    # Conversation State Cache
+    CONVERSATION_CACHE_ENABLED: bool = False
+    CONVERSATION_CACHE_MAX_ENTRIES: int = 10000
+    CONVERSATION_CACHE_TTL_SECONDS: float = 300.0
+
+    # Inbound Deduplication
+    DEDUP_CACHE_SIZE: int = 50000
+    PROCESSED_MESSAGES_RETENTION_DAYS: float = 14
+    PROCESSED_MESSAGES_PRUNE_INTERVAL_SECONDS: float = 3600
+
+    # Email Metadata Cache
+    EMAIL_METADATA_CACHE_ENABLED: bool = True
+    EMAIL_METADATA_CACHE_MAX_ENTRIES: int = 10000
+    EMAIL_METADATA_CACHE_TTL_SECONDS: float = 600
+
+    # Session Timeout
+    SESSION_TIMEOUT_MINUTES: int = 15
+    SESSION_TIMEOUT_INTERVAL_SECONDS: float = 60
+    SESSION_TIMEOUT_PAGE_SIZE: int = 200
+    SESSION_TIMEOUT_CONCURRENCY: int = 8
+    SESSION_TIMEOUT_WHATSAPP_PER_SECOND: float = 10
+    SESSION_TIMEOUT_INSTAGRAM_PER_SECOND: float = 5
+    SESSION_TIMER_ENABLED: bool = True
+    SESSION_TIMER_TICK_SECONDS: float = 1.0
+    SESSION_TIMER_RECONCILE_SECONDS: float = 600
+    SESSION_TIMER_CATCH_UP_SECONDS: float = 10
+    SESSION_TIMER_RETRY_SECONDS: float = 30
+
+    # Write-Behind Group Commit
+    WRITE_BEHIND_ENABLED: bool = True
+    WRITE_BEHIND_MAX_ROWS: int = 200
+    WRITE_BEHIND_MAX_DELAY_MS: float = 5.0
+
     # Database
     DB_HOST: str
     DB_PORT: int
     DB_NAME: str
     DB_USER: str
     DB_PASS: Optional[str] = None
+    DB_AUTO_MIGRATE: bool = False
+    DB_POOL_MIN_SIZE: int = 4
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_MAX_WAITING: int = 0
+    DB_POOL_MAX_IDLE_SECONDS: float = 600.0
+    DB_POOL_MAX_LIFETIME_SECONDS: float = 3600.0
+    DB_POOL_WARMUP_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_CHECK_ON_CHECKOUT: bool = True
+    DB_REPLICA_HOST: Optional[str] = None
+    DB_REPLICA_PORT: Optional[int] = None
+    DB_REPLICA_POOL_MIN_SIZE: int = 2
+    DB_REPLICA_POOL_MAX_SIZE: int = 10
+    DB_REPLICA_CHECKOUT_TIMEOUT_SECONDS: float = 2.0
+    DB_REPLICA_MAX_LAG_SECONDS: float = 2.0
+    DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5.0
 
     # Social Media Credentials
     INSTAGRAM_PAGE_ACCESS_TOKEN: Optional[str] = None
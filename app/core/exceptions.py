@@ -12,4 +12,8 @@ class AdapterError(AppError):
 
 class DatabaseError(AppError):
     """Raised when database operation fails."""
+    pass
+
+class QueueFullError(AppError):
+    """Raised when a bounded work queue cannot accept more work."""
     pass
\ No newline at end of file
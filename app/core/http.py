@@ -0,0 +1,60 @@
+import httpx
+import logging
+from typing import Dict, Any
+from urllib.parse import urlsplit
+from app.core.config import settings
+
+logger = logging.getLogger("core.http")
+
+class HttpClients:
+    # One pooled AsyncClient per upstream host (graph.facebook.com, graph.instagram.com,
+    # graph.microsoft.com, the backend), so connection limits apply per host and
+    # keep-alive connections are reused across messages.
+    _clients: Dict[str, httpx.AsyncClient] = {}
+    _http2: bool = False
+
+    @classmethod
+    def initialize(cls):
+        cls._http2 = settings.HTTP2_ENABLED
+        if cls._http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP2_ENABLED is set but the 'h2' package is missing, falling back to HTTP/1.1")
+                cls._http2 = False
+        logger.info(f"HTTP client registry ready (http2={cls._http2})")
+
+    @classmethod
+    def _create(cls) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=cls._http2,
+            timeout=settings.HTTP_DEFAULT_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+
+    @classmethod
+    def for_url(cls, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        client = cls._clients.get(host)
+        if client is None or client.is_closed:
+            client = cls._create()
+            cls._clients[host] = client
+        return client
+
+    @classmethod
+    async def close(cls):
+        clients, cls._clients = cls._clients, {}
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Failed to close HTTP client: {e}")
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        return {"http2": cls._http2, "hosts": sorted(cls._clients)}
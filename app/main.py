@@ -1,20 +1,25 @@
 import threading
 import asyncio
 from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.http import HttpClients
 from app.repositories.base import Database
+from app.repositories.migrations import apply_migrations
 from app.api.routes import router as api_router
+from app.api.dependencies import get_dispatcher, get_coalescer, get_chatbot, get_outbox, get_state_cache, get_writer
 from app.adapters.email.listener import start_email_listener
 from app.services.scheduler import run_scheduler
+from app.services.leader import LeaderElection
 import logging
 
 setup_logging()
 logger = logging.getLogger("main")
 
-def _setup_email_listener():
+def _setup_email_listener(stop: Optional[threading.Event] = None) -> Optional[threading.Thread]:
     is_listener_running = False
     for t in threading.enumerate():
         if t.name == "EmailListenerThread":
@@ -24,32 +29,89 @@ def _setup_email_listener():
     if not is_listener_running and settings.EMAIL_PROVIDER != "unknown":
         email_thread = threading.Thread(
             target=start_email_listener, 
+            args=(stop,),
             name="EmailListenerThread", 
             daemon=True
         )
         email_thread.start()
         logger.info("Email Listener Thread Started")
+        return email_thread
     elif is_listener_running:
         logger.warning("⚠️ Email Listener already running, skipping start.")
+    return None
+
+async def _run_email_listener():
+    # Job for the email-listener election. A poller stopped by a previous loss of leadership
+    # finishes its current poll first; dedup claims cover the overlap with the new leader.
+    # Polled rather than joined in an executor thread, so cancelling the job frees nothing
+    # that shutdown would have to wait for.
+    for t in threading.enumerate():
+        if t.name == "EmailListenerThread":
+            while t.is_alive():
+                await asyncio.sleep(1)
+
+    stop = threading.Event()
+    email_thread = _setup_email_listener(stop)
+    try:
+        while email_thread and email_thread.is_alive():
+            await asyncio.sleep(1)
+    finally:
+        stop.set()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Database.initialize()
+    if settings.DB_AUTO_MIGRATE:
+        await apply_migrations()
+    await Database.initialize()
+    if settings.WRITE_BEHIND_ENABLED:
+        get_writer().start()
+    HttpClients.initialize()
+    dispatcher = get_dispatcher()
+    await dispatcher.start()
+    if settings.OUTBOX_ENABLED:
+        get_outbox().start()
+    if settings.CONVERSATION_CACHE_ENABLED:
+        get_state_cache().start()
     
     scheduler_task = None
+    elections = []
     
     if settings.ENABLE_BACKGROUND_WORKER:
-        _setup_email_listener()
-        scheduler_task = asyncio.create_task(run_scheduler())
+        if settings.LEADER_ELECTION_ENABLED:
+            # Every instance may run the API; only the lock holders run the background jobs.
+            jobs = {"scheduler": run_scheduler}
+            if settings.EMAIL_PROVIDER != "unknown" and (settings.EMAIL_USER or settings.AZURE_CLIENT_ID):
+                jobs["email-listener"] = _run_email_listener
+            for name, job in jobs.items():
+                election = LeaderElection(
+                    name,
+                    job,
+                    retry_interval=settings.LEADER_RETRY_INTERVAL_SECONDS,
+                    heartbeat_interval=settings.LEADER_HEARTBEAT_INTERVAL_SECONDS
+                )
+                election.start()
+                elections.append(election)
+        else:
+            _setup_email_listener()
+            scheduler_task = asyncio.create_task(run_scheduler())
     
     yield
     
     try:
+        for election in elections:
+            await election.stop()
         if scheduler_task:
             scheduler_task.cancel()
-            await scheduler_task
+            await asyncio.gather(scheduler_task, return_exceptions=True)
     finally:
-        Database.close()
+        await dispatcher.stop(drain_timeout=settings.DISPATCH_DRAIN_TIMEOUT_SECONDS)
+        await get_coalescer().close()
+        await get_outbox().stop()
+        await get_state_cache().stop()
+        await get_chatbot().close(timeout=settings.DISPATCH_DRAIN_TIMEOUT_SECONDS)
+        await HttpClients.close()
+        await get_writer().stop()
+        await Database.close()
 
 app = FastAPI(
     title=settings.APP_NAME,
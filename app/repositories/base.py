@@ -1,53 +1,202 @@
-from psycopg_pool import ConnectionPool
-from contextlib import contextmanager
+import asyncio
+from psycopg_pool import AsyncConnectionPool
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, Optional
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger("db")
 
 class Database:
-    _pool: ConnectionPool = None
+    _pool: AsyncConnectionPool = None
+    _replica_pool: AsyncConnectionPool = None
+    _replica_lag: Optional[float] = None
+    _lag_task: Optional[asyncio.Task] = None
+    replica_reads = 0
+    primary_reads = 0
+    replica_fallbacks = 0
+    conn_args = {
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 5
+    }
+
+    @staticmethod
+    def conninfo(host: Optional[str] = None, port: Optional[int] = None) -> str:
+        return (
+            f"dbname={settings.DB_NAME} "
+            f"user={settings.DB_USER} "
+            f"password={settings.DB_PASS} "
+            f"host={host or settings.DB_HOST} "
+            f"port={port or settings.DB_PORT}"
+        )
 
     @classmethod
-    def initialize(cls):
+    async def initialize(cls):
         if cls._pool is None:
             logger.info("Initializing Database Connection Pool...")
-            conn_args = {
-                "keepalives": 1,
-                "keepalives_idle": 30,
-                "keepalives_interval": 10,
-                "keepalives_count": 5
-            }
-            
-            cls._pool = ConnectionPool(
-                conninfo=(
-                    f"dbname={settings.DB_NAME} "
-                    f"user={settings.DB_USER} "
-                    f"password={settings.DB_PASS} "
-                    f"host={settings.DB_HOST} "
-                    f"port={settings.DB_PORT}"
-                ),
-                min_size=1,
-                max_size=10,
-                timeout=30,
-                kwargs=conn_args, 
-                check=ConnectionPool.check_connection 
+            cls._pool = AsyncConnectionPool(
+                conninfo=cls.conninfo(),
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=max(settings.DB_POOL_MIN_SIZE, settings.DB_POOL_MAX_SIZE),
+                timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+                max_waiting=settings.DB_POOL_MAX_WAITING,
+                max_idle=settings.DB_POOL_MAX_IDLE_SECONDS,
+                max_lifetime=settings.DB_POOL_MAX_LIFETIME_SECONDS,
+                kwargs=cls.conn_args,
+                check=AsyncConnectionPool.check_connection if settings.DB_POOL_CHECK_ON_CHECKOUT else None,
+                name="bkpm",
+                open=False
+            )
+            # Block startup until min_size connections are up, so the first burst of
+            # webhooks does not pay for connection setup one request at a time.
+            await cls._pool.open(wait=True, timeout=settings.DB_POOL_WARMUP_TIMEOUT_SECONDS)
+            logger.info(f"Database pool ready with {settings.DB_POOL_MIN_SIZE} connections")
+
+        if settings.DB_REPLICA_HOST and cls._replica_pool is None:
+            logger.info(f"Initializing read replica pool on {settings.DB_REPLICA_HOST}...")
+            cls._replica_pool = AsyncConnectionPool(
+                conninfo=cls.conninfo(settings.DB_REPLICA_HOST, settings.DB_REPLICA_PORT),
+                min_size=settings.DB_REPLICA_POOL_MIN_SIZE,
+                max_size=max(settings.DB_REPLICA_POOL_MIN_SIZE, settings.DB_REPLICA_POOL_MAX_SIZE),
+                timeout=settings.DB_REPLICA_CHECKOUT_TIMEOUT_SECONDS,
+                max_idle=settings.DB_POOL_MAX_IDLE_SECONDS,
+                max_lifetime=settings.DB_POOL_MAX_LIFETIME_SECONDS,
+                kwargs=cls.conn_args,
+                check=AsyncConnectionPool.check_connection if settings.DB_POOL_CHECK_ON_CHECKOUT else None,
+                name="bkpm-replica",
+                open=False
             )
+            # A replica that is down must not block startup; reads stay on the primary
+            # until the lag probe gets an answer.
+            await cls._replica_pool.open(wait=False)
+            cls._lag_task = asyncio.create_task(cls._watch_replica_lag(), name="replica-lag-probe")
 
     @classmethod
-    def close(cls):
+    async def close(cls):
+        if cls._lag_task:
+            cls._lag_task.cancel()
+            await asyncio.gather(cls._lag_task, return_exceptions=True)
+            cls._lag_task = None
+        if cls._replica_pool:
+            await cls._replica_pool.close()
+            cls._replica_pool = None
+            cls._replica_lag = None
         if cls._pool:
-            cls._pool.close()
+            await cls._pool.close()
+            cls._pool = None
+
+    @classmethod
+    async def _watch_replica_lag(cls):
+        # Lag is how far replay is behind the primary, in seconds. The primary's current WAL
+        # position is read first: a replica that has replayed up to it reports 0, so an idle
+        # primary does not look like lag, while one that stopped receiving WAL falls behind
+        # as soon as the primary writes anything.
+        while True:
+            try:
+                async with cls._pool.connection() as primary:
+                    primary_lsn = (await (await primary.execute("SELECT pg_current_wal_lsn()")).fetchone())[0]
+                async with cls._replica_pool.connection(timeout=settings.DB_REPLICA_CHECKOUT_TIMEOUT_SECONDS) as conn:
+                    cursor = await conn.execute(
+                        """
+                        SELECT CASE
+                            WHEN NOT pg_is_in_recovery() THEN 0
+                            WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+                            ELSE EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp())
+                        END
+                        """,
+                        (primary_lsn,)
+                    )
+                    lag = (await cursor.fetchone())[0]
+                    # Nothing replayed yet means the replica's age is unknown.
+                    cls._replica_lag = float(lag) if lag is not None else None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if cls._replica_lag is not None:
+                    logger.warning(f"Read replica unavailable, routing reads to primary: {e}")
+                cls._replica_lag = None
+            await asyncio.sleep(settings.DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS)
+
+    @classmethod
+    def _replica_usable(cls) -> bool:
+        return (
+            cls._replica_pool is not None
+            and cls._replica_lag is not None
+            and cls._replica_lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        )
 
     @classmethod
-    @contextmanager
-    def get_connection(cls):
+    def get_stats(cls) -> Dict[str, Any]:
+        stats = cls._pool_stats(cls._pool)
+        if cls._replica_pool is not None:
+            stats["replica"] = {
+                **cls._pool_stats(cls._replica_pool),
+                "lag_seconds": cls._replica_lag,
+                "in_use": cls._replica_usable(),
+                "replica_reads": cls.replica_reads,
+                "primary_reads": cls.primary_reads,
+                "fallbacks": cls.replica_fallbacks
+            }
+        return stats
+
+    @staticmethod
+    def _pool_stats(pool: Optional[AsyncConnectionPool]) -> Dict[str, Any]:
+        if pool is None:
+            return {"open": False}
+        stats = pool.get_stats()
+        requests = stats.get("requests_num", 0)
+        queued = stats.get("requests_queued", 0)
+        return {
+            "open": True,
+            "size": stats.get("pool_size", 0),
+            "available": stats.get("pool_available", 0),
+            "min_size": stats.get("pool_min", 0),
+            "max_size": stats.get("pool_max", 0),
+            "waiting": stats.get("requests_waiting", 0),
+            "requests": requests,
+            "queued_requests": queued,
+            "avg_wait_ms": round(stats.get("requests_wait_ms", 0) / queued, 2) if queued else 0.0,
+            "avg_checkout_ms": round(stats.get("usage_ms", 0) / requests, 2) if requests else 0.0,
+            "request_errors": stats.get("requests_errors", 0),
+            "connections_opened": stats.get("connections_num", 0),
+            "connection_errors": stats.get("connections_errors", 0),
+            "connections_lost": stats.get("connections_lost", 0),
+            "bad_returns": stats.get("returns_bad", 0)
+        }
+
+    @classmethod
+    @asynccontextmanager
+    async def get_connection(cls):
         if cls._pool is None:
-            cls.initialize()
-        
-        with cls._pool.connection() as conn:
+            await cls.initialize()
+
+        async with cls._pool.connection() as conn:
+            yield conn
+
+    @classmethod
+    @asynccontextmanager
+    async def get_read_connection(cls):
+        # For read-only lookups that tolerate DB_REPLICA_MAX_LAG_SECONDS of staleness. Goes to
+        # the replica while it is within that lag, otherwise (or if no replica connection can
+        # be had in time) to the primary.
+        async with AsyncExitStack() as stack:
+            conn = None
+            if cls._replica_usable():
+                try:
+                    conn = await stack.enter_async_context(
+                        cls._replica_pool.connection(timeout=settings.DB_REPLICA_CHECKOUT_TIMEOUT_SECONDS)
+                    )
+                    cls.replica_reads += 1
+                except Exception as e:
+                    cls.replica_fallbacks += 1
+                    logger.warning(f"Read replica checkout failed, using primary: {e}")
+            if conn is None:
+                conn = await stack.enter_async_context(cls.get_connection())
+                cls.primary_reads += 1
             yield conn
 
-def get_db_connection():
-    with Database.get_connection() as conn:
-        yield conn
\ No newline at end of file
+async def get_db_connection():
+    async with Database.get_connection() as conn:
+        yield conn
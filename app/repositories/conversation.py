@@ -1,16 +1,35 @@
-from typing import Optional, List, Tuple
+from datetime import datetime
+from typing import Any, Dict, Optional, List, Tuple
 from app.repositories.base import Database
+from app.repositories.write_behind import WriteBehindBuffer
 from app.core.exceptions import DatabaseError
+from app.schemas.models import ConversationState
 import logging
 
 logger = logging.getLogger("repo.conversation")
 
+_STATE_QUERY = """
+    SELECT id, is_helpdesk, end_timestamp IS NOT NULL
+    FROM bkpm.conversations
+    WHERE platform_unique_id = %s AND platform = %s
+    ORDER BY start_timestamp DESC
+    LIMIT 1
+"""
+
+def _to_state(row) -> ConversationState:
+    if not row:
+        return ConversationState()
+    return ConversationState(conversation_id=str(row[0]), is_helpdesk=bool(row[1]), ended=row[2])
+
 class ConversationRepository:
-    def get_active_id(self, platform_id: str, platform: str) -> Optional[str]:
+    def __init__(self, writer: Optional[WriteBehindBuffer] = None):
+        self.writer = writer
+
+    async def get_active_id(self, platform_id: str, platform: str) -> Optional[str]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_read_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         """
                         SELECT id, end_timestamp
                         FROM bkpm.conversations
@@ -20,7 +39,7 @@ class ConversationRepository:
                         """,
                         (platform_id, platform)
                     )
-                    row = cursor.fetchone()
+                    row = await cursor.fetchone()
                     
                     if row:
                         conversation_id, end_timestamp = row
@@ -31,11 +50,42 @@ class ConversationRepository:
             logger.error(f"Error fetching active conversation: {e}")
             raise DatabaseError("Failed to fetch conversation")
 
-    def get_latest_id(self, platform_id: str, platform: str) -> Optional[str]:
+    async def get_conversation_state(self, platform_id: str, platform: str) -> ConversationState:
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(_STATE_QUERY, (platform_id, platform), prepare=True)
+                    return _to_state(await cursor.fetchone())
+        except Exception as e:
+            logger.error(f"Error fetching conversation state: {e}")
+            raise DatabaseError("Failed to fetch conversation")
+
+    async def get_conversation_states(self, keys: List[Tuple[str, str]]) -> List[ConversationState]:
+        if not keys:
+            return []
+        try:
+            async with Database.get_connection() as conn:
+                cursors = []
+                # One network round trip for the whole batch instead of one per (user, platform).
+                async with conn.pipeline():
+                    for platform_id, platform in keys:
+                        cursor = conn.cursor()
+                        await cursor.execute(_STATE_QUERY, (platform_id, platform), prepare=True)
+                        cursors.append(cursor)
+                states = []
+                for cursor in cursors:
+                    states.append(_to_state(await cursor.fetchone()))
+                    await cursor.close()
+                return states
+        except Exception as e:
+            logger.error(f"Error fetching conversation states: {e}")
+            raise DatabaseError("Failed to fetch conversations")
+
+    async def get_latest_id(self, platform_id: str, platform: str) -> Optional[str]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_read_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         """
                         SELECT id
                         FROM bkpm.conversations
@@ -45,42 +95,141 @@ class ConversationRepository:
                         """,
                         (platform_id, platform)
                     )
-                    row = cursor.fetchone()
+                    row = await cursor.fetchone()
                     return str(row[0]) if row else None
         except Exception as e:
             logger.error(f"Error fetching latest conversation: {e}")
             return None
 
-    def get_stale_sessions(self, minutes: int = 15) -> List[Tuple[str, str, str]]:
+    async def get_stale_sessions(
+        self,
+        minutes: int = 15,
+        limit: int = 50,
+        after: Optional[Tuple[datetime, str]] = None,
+        platform: Optional[str] = None
+    ) -> List[Tuple[str, str, str, datetime]]:
+        # Oldest inactivity first. `after` is the (last_activity_at, id) of the previous page's
+        # last row; the >= bound keeps the next page a range scan on the activity index.
+        platforms = "AND c.platform IN ('whatsapp', 'instagram')"
+        keyset = ""
+        params: List[Any] = [minutes]
+        if platform:
+            platforms = "AND c.platform = %s"
+            params.append(platform)
+        if after:
+            keyset = "AND c.last_activity_at >= %s AND (c.last_activity_at > %s OR c.id > %s::uuid)"
+            params += [after[0], after[0], after[1]]
+        params.append(limit)
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_read_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         f"""
-                        SELECT c.id, c.platform, c.platform_unique_id
+                        SELECT c.id, c.platform, c.platform_unique_id, c.last_activity_at
                         FROM bkpm.conversations c
                         WHERE c.end_timestamp IS NULL 
-                        AND c.platform IN ('whatsapp', 'instagram')
-                        AND c.start_timestamp >= CURRENT_DATE
                         AND c.is_helpdesk = FALSE
-                        AND COALESCE(
-                            (SELECT MAX(created_at) FROM bkpm.chat_history WHERE session_id = c.id),
-                            c.start_timestamp
-                        ) < NOW() - INTERVAL '{minutes} minutes'
-                        LIMIT 50
-                        """
+                        AND c.last_activity_at < NOW() - make_interval(mins => %s)
+                        {platforms}
+                        AND c.start_timestamp >= CURRENT_DATE
+                        {keyset}
+                        ORDER BY c.last_activity_at, c.id
+                        LIMIT %s
+                        """,
+                        params
                     )
-                    rows = cursor.fetchall()
-                    return [(str(row[0]), row[1], row[2]) for row in rows]
+                    rows = await cursor.fetchall()
+                    return [(str(row[0]), row[1], row[2], row[3]) for row in rows]
         except Exception as e:
             logger.error(f"Error fetching stale sessions: {e}")
             return []
 
-    def is_helpdesk_session(self, conversation_id: str) -> bool:
+    async def get_recent_sessions(
+        self,
+        seconds: float,
+        limit: int = 200,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> List[Tuple[str, str, str, datetime]]:
+        # Open sessions active in the last `seconds`, paged like get_stale_sessions. Read from
+        # the primary so a lagging replica cannot hide activity from the window.
+        keyset = ""
+        params: List[Any] = [seconds]
+        if after:
+            keyset = "AND c.last_activity_at >= %s AND (c.last_activity_at > %s OR c.id > %s::uuid)"
+            params += [after[0], after[0], after[1]]
+        params.append(limit)
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        f"""
+                        SELECT c.id, c.platform, c.platform_unique_id, c.last_activity_at
+                        FROM bkpm.conversations c
+                        WHERE c.end_timestamp IS NULL
+                        AND c.is_helpdesk = FALSE
+                        AND c.last_activity_at >= NOW() - make_interval(secs => %s)
+                        AND c.platform IN ('whatsapp', 'instagram')
+                        AND c.start_timestamp >= CURRENT_DATE
+                        {keyset}
+                        ORDER BY c.last_activity_at, c.id
+                        LIMIT %s
+                        """,
+                        params
+                    )
+                    rows = await cursor.fetchall()
+                    return [(str(row[0]), row[1], row[2], row[3]) for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching recent sessions: {e}")
+            return []
+
+    async def get_open_session_activity(self, conversation_ids: List[str]) -> Dict[str, datetime]:
+        # Read from the primary: it decides whether a session is really due, and a lagging
+        # replica could miss the message that just kept it alive.
+        if not conversation_ids:
+            return {}
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT id, last_activity_at
+                        FROM bkpm.conversations
+                        WHERE id = ANY(%s::uuid[]) AND end_timestamp IS NULL AND is_helpdesk = FALSE
+                        """,
+                        (conversation_ids,)
+                    )
+                    return {str(row[0]): row[1] for row in await cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error fetching session activity: {e}")
+            raise DatabaseError("Failed to fetch session activity")
+
+    async def touch_activity(self, conversation_ids: List[str]):
+        if not conversation_ids:
+            return
+        if self.writer and self.writer.running:
+            # Nobody waits on an activity bump; it is committed with the next flush.
+            self.writer.submit("touch", list(conversation_ids))
+            return
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        UPDATE bkpm.conversations
+                        SET last_activity_at = NOW()
+                        WHERE id = ANY(%s::uuid[]) AND end_timestamp IS NULL
+                        """,
+                        (conversation_ids,)
+                    )
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"Error updating activity for {conversation_ids}: {e}")
+
+    async def is_helpdesk_session(self, conversation_id: str) -> bool:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_read_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         """
                         SELECT is_helpdesk
                         FROM bkpm.conversations
@@ -89,17 +238,19 @@ class ConversationRepository:
                         """,
                         (conversation_id,)
                     )
-                    row = cursor.fetchone()
+                    row = await cursor.fetchone()
                     return bool(row[0]) if row else False
         except Exception as e:
             logger.error(f"Error checking helpdesk status for {conversation_id}: {e}")
             return False  
 
-    def close_session(self, conversation_id: str):
+    async def close_session(self, conversation_id: str):
+        if self.writer and self.writer.running:
+            return await self.writer.submit("close", conversation_id)
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         """
                         UPDATE bkpm.conversations
                         SET end_timestamp = NOW()
@@ -107,7 +258,7 @@ class ConversationRepository:
                         """,
                         (conversation_id,)
                     )
-                    conn.commit()
+                    await conn.commit()
                     logger.info(f"Session {conversation_id} closed successfully.")
         except Exception as e:
             logger.error(f"Error closing session {conversation_id}: {e}")
\ No newline at end of file
@@ -1,43 +1,95 @@
-from typing import Optional, Dict
-from psycopg import errors # Pastikan library psycopg sudah terinstall
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Dict, List, Set, Tuple
 from app.repositories.base import Database
+from app.repositories.write_behind import WriteBehindBuffer
 from app.core.exceptions import DatabaseError
 import logging
 
 logger = logging.getLogger("repo.message")
 
 class MessageRepository:
-    def is_processed(self, message_id: str, platform: str) -> bool:
+    def __init__(self, writer: Optional[WriteBehindBuffer] = None):
+        self.writer = writer
+
+    async def is_processed(self, message_id: str, platform: str) -> bool:
+        try:
+            return not await self.claim_message_ids(platform, [message_id])
+        except DatabaseError:
+            return True
+
+    async def claim_message_ids(self, platform: str, message_ids: List[str]) -> Set[str]:
+        # Records the whole batch in one statement; only ids that were not seen before come back.
+        if not message_ids:
+            return set()
+        if self.writer and self.writer.running:
+            return await self.writer.submit("claim", (platform, list(message_ids)))
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        INSERT INTO bkpm.processed_messages (message_id, platform)
+                        SELECT unnest(%s::text[]), %s
+                        ON CONFLICT DO NOTHING
+                        RETURNING message_id
+                        """,
+                        (message_ids, platform)
+                    )
+                    rows = await cursor.fetchall()
+                    await conn.commit()
+                    return {row[0] for row in rows}
+        except Exception as e:
+            logger.error(f"DB Check Error: {e}")
+            raise DatabaseError("Failed to record processed messages")
+
+    async def release_message_ids(self, platform: str, message_ids: List[str]):
+        if not message_ids:
+            return
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        "DELETE FROM bkpm.processed_messages WHERE message_id = ANY(%s) AND platform = %s",
+                        (message_ids, platform)
+                    )
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to release processed messages {message_ids}: {e}")
+
+    async def prune_processed(self, retention_days: float, batch_size: int = 5000) -> int:
+        # Deletes in short batches so the dedup inserts running alongside never wait on a long lock.
+        deleted = 0
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    try:
-                        cursor.execute(
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    while True:
+                        await cursor.execute(
                             """
-                            INSERT INTO bkpm.processed_messages (message_id, platform)
-                            VALUES (%s, %s)
+                            DELETE FROM bkpm.processed_messages
+                            WHERE message_id IN (
+                                SELECT message_id
+                                FROM bkpm.processed_messages
+                                WHERE processed_at < NOW() - make_interval(secs => %s)
+                                LIMIT %s
+                            )
                             """,
-                            (message_id, platform)
+                            (retention_days * 86400, batch_size)
                         )
-                        conn.commit()
-                        return False 
-                        
-                    except errors.UniqueViolation:
-                        conn.rollback()
-                        return True 
-                        
+                        await conn.commit()
+                        deleted += cursor.rowcount
+                        if cursor.rowcount < batch_size:
+                            return deleted
         except Exception as e:
-            if "duplicate key" in str(e).lower():
-                return True
-            logger.error(f"DB Check Error: {e}")
-            return True 
+            logger.error(f"Failed to prune processed messages: {e}")
+            return deleted
 
-    def get_conversation_by_azure_thread(self, azure_conversation_id: str) -> Optional[str]:
+    async def get_conversation_by_azure_thread(self, azure_conversation_id: str) -> Optional[str]:
         if not azure_conversation_id: return None
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         """
                         SELECT conversation_id 
                         FROM bkpm.email_metadata 
@@ -46,20 +98,22 @@ class MessageRepository:
                         """, 
                         (azure_conversation_id,)
                     )
-                    row = cursor.fetchone()
+                    row = await cursor.fetchone()
                     return str(row[0]) if row else None
         except Exception as e:
             logger.error(f"Failed to find Azure thread: {e}")
             return None
 
-    def get_conversation_by_thread(self, thread_key: str) -> Optional[str]:
-        return self.get_conversation_by_azure_thread(thread_key)
+    async def get_conversation_by_thread(self, thread_key: str) -> Optional[str]:
+        return await self.get_conversation_by_azure_thread(thread_key)
 
-    def save_email_metadata(self, conversation_id: str, subject: str, in_reply_to: str, references: str, thread_key: str):
+    async def save_email_metadata(self, conversation_id: str, subject: str, in_reply_to: str, references: str, thread_key: str) -> bool:
+        if self.writer and self.writer.running:
+            return await self.writer.submit("email", (conversation_id, subject, in_reply_to, references, thread_key))
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         """
                         INSERT INTO bkpm.email_metadata (conversation_id, subject, in_reply_to, "references", thread_key)
                         VALUES (%s, %s, %s, %s, %s)
@@ -73,15 +127,17 @@ class MessageRepository:
                         """,
                         (conversation_id, subject, in_reply_to, references, thread_key)
                     )
-                    conn.commit()
+                    await conn.commit()
+                    return True
         except Exception as e:
             logger.error(f"Failed to save email metadata: {e}")
+            return False
 
-    def get_email_metadata(self, conversation_id: str) -> Optional[Dict[str, str]]:
+    async def get_email_metadata(self, conversation_id: str) -> Optional[Dict[str, str]]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
+            async with Database.get_read_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
                         """
                         SELECT subject, in_reply_to, "references", thread_key 
                         FROM bkpm.email_metadata 
@@ -90,7 +146,7 @@ class MessageRepository:
                         """, 
                         (conversation_id,)
                     )
-                    row = cursor.fetchone()
+                    row = await cursor.fetchone()
                     if row:
                         return {
                             "subject": row[0], 
@@ -104,12 +160,92 @@ class MessageRepository:
             logger.error(f"Failed to get email metadata: {e}")
             return None
 
-    def get_latest_answer_id(self, conversation_id: str) -> Optional[int]:
+    async def get_latest_answer_id(self, conversation_id: str) -> Optional[int]:
         try:
-            with Database.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute("SELECT id FROM bkpm.chat_history WHERE session_id = %s ORDER BY created_at DESC LIMIT 1", (conversation_id,))
-                    row = cursor.fetchone()
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT id FROM bkpm.chat_history WHERE session_id = %s ORDER BY created_at DESC LIMIT 1", (conversation_id,))
+                    row = await cursor.fetchone()
                     return int(row[0]) if row else None
         except Exception:
-            return None
\ No newline at end of file
+            return None
+
+
+class CachedMessageRepository(MessageRepository):
+    # Write-through LRU + TTL cache for the email thread lookups: conversation -> metadata
+    # for replies, thread_key -> conversation for inbound mail. save_email_metadata fills
+    # both after a successful write, so a busy thread is answered from memory. Another
+    # replica may save a newer in_reply_to for the same thread; the TTL bounds how long a
+    # reply can point at the previous message of that thread.
+
+    def __init__(self, max_entries: int, ttl: float, writer: Optional[WriteBehindBuffer] = None):
+        super().__init__(writer)
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._metadata: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+        self._threads: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, entries: OrderedDict, key: str):
+        entry = entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del entries[key]
+            self.misses += 1
+            return None
+        entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _store(self, entries: OrderedDict, key: str, value):
+        entries[key] = (time.monotonic() + self.ttl, value)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_conversation_by_azure_thread(self, azure_conversation_id: str) -> Optional[str]:
+        if not azure_conversation_id: return None
+        conversation_id = self._lookup(self._threads, azure_conversation_id)
+        if conversation_id is None:
+            conversation_id = await super().get_conversation_by_azure_thread(azure_conversation_id)
+            if conversation_id:
+                self._store(self._threads, azure_conversation_id, conversation_id)
+        return conversation_id
+
+    async def save_email_metadata(self, conversation_id: str, subject: str, in_reply_to: str, references: str, thread_key: str) -> bool:
+        if not await super().save_email_metadata(conversation_id, subject, in_reply_to, references, thread_key):
+            self._metadata.pop(conversation_id, None)
+            return False
+
+        self._store(self._metadata, conversation_id, {
+            "subject": subject,
+            "in_reply_to": in_reply_to,
+            "graph_message_id": in_reply_to,
+            "references": references,
+            "thread_key": thread_key
+        })
+        if thread_key:
+            self._store(self._threads, thread_key, conversation_id)
+        return True
+
+    async def get_email_metadata(self, conversation_id: str) -> Optional[Dict[str, str]]:
+        meta = self._lookup(self._metadata, conversation_id)
+        if meta is None:
+            meta = await super().get_email_metadata(conversation_id)
+            if meta is None:
+                return None
+            self._store(self._metadata, conversation_id, meta)
+        # Callers update send kwargs from this dict; hand out a copy so the cached one stays intact.
+        return dict(meta)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "metadata_entries": len(self._metadata),
+            "thread_entries": len(self._threads),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+from typing import List
+import psycopg
+from app.repositories.base import Database
+from app.core.exceptions import DatabaseError
+
+logger = logging.getLogger("db.migrations")
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+
+# First line of a migration whose statements must run outside a transaction block.
+NO_TRANSACTION = "-- migrate:no-transaction"
+
+_LOCK_KEY = "hashtext('bkpm.schema_migrations')"
+
+def _statements(sql: str) -> List[str]:
+    # No-transaction files hold plain statements with no ';' inside literals.
+    code = "\n".join(line for line in sql.splitlines() if not line.lstrip().startswith("--"))
+    return [chunk.strip() for chunk in code.split(";") if chunk.strip()]
+
+async def apply_migrations(directory: Path = MIGRATIONS_DIR, dry_run: bool = False) -> List[str]:
+    # Applies every migrations/NNNN_*.sql not yet recorded in bkpm.schema_migrations, in
+    # file name order, each in its own transaction unless it starts with NO_TRANSACTION
+    # (CREATE INDEX CONCURRENTLY). The advisory lock lets several replicas start at once
+    # without applying the same file twice; it is polled rather than waited on so a waiting
+    # replica holds no snapshot that a concurrent index build would have to wait for.
+    applied_now = []
+    async with await psycopg.AsyncConnection.connect(Database.conninfo(), autocommit=True, **Database.conn_args) as conn:
+        while not (await (await conn.execute(f"SELECT pg_try_advisory_lock({_LOCK_KEY})")).fetchone())[0]:
+            await asyncio.sleep(1)
+        try:
+            await conn.execute("CREATE SCHEMA IF NOT EXISTS bkpm")
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bkpm.schema_migrations (
+                    version TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+
+            cursor = await conn.execute("SELECT version FROM bkpm.schema_migrations")
+            applied = {row[0] for row in await cursor.fetchall()}
+
+            for path in sorted(directory.glob("*.sql")):
+                version = path.stem
+                if version in applied:
+                    continue
+                applied_now.append(version)
+                if dry_run:
+                    continue
+
+                logger.info(f"Applying migration {version}")
+                sql = path.read_text()
+                try:
+                    if sql.startswith(NO_TRANSACTION):
+                        for statement in _statements(sql):
+                            await conn.execute(statement)
+                        await conn.execute("INSERT INTO bkpm.schema_migrations (version) VALUES (%s)", (version,))
+                    else:
+                        async with conn.transaction():
+                            await conn.execute(sql)
+                            await conn.execute("INSERT INTO bkpm.schema_migrations (version) VALUES (%s)", (version,))
+                except Exception as e:
+                    logger.error(f"Migration {version} failed: {e}")
+                    raise DatabaseError(f"Migration {version} failed")
+        finally:
+            await conn.execute(f"SELECT pg_advisory_unlock({_LOCK_KEY})")
+
+    return applied_now
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Apply pending SQL migrations")
+    parser.add_argument("--dry-run", action="store_true", help="only list pending migrations")
+    args = parser.parse_args()
+
+    versions = await apply_migrations(dry_run=args.dry_run)
+    action = "Pending" if args.dry_run else "Applied"
+    print(f"{action}: {', '.join(versions) if versions else 'nothing'}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,150 @@
+from typing import Any, Dict, List, Tuple
+from psycopg.types.json import Jsonb
+from app.repositories.base import Database
+from app.core.exceptions import DatabaseError
+import logging
+
+logger = logging.getLogger("repo.outbox")
+
+class OutboxRepository:
+    async def enqueue_ask(self, payload: Dict[str, Any], resolve_active: bool = True) -> str:
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    if resolve_active:
+                        # Re-read the user's session in the same transaction as the insert, so a
+                        # session opened or closed while the message waited is picked up atomically.
+                        await cursor.execute(
+                            """
+                            SELECT id, end_timestamp
+                            FROM bkpm.conversations
+                            WHERE platform_unique_id = %s AND platform = %s
+                            ORDER BY start_timestamp DESC
+                            LIMIT 1
+                            """,
+                            (payload["platform_unique_id"], payload["platform"])
+                        )
+                        row = await cursor.fetchone()
+                        if row and row[1] is None:
+                            payload["conversation_id"] = str(row[0])
+
+                    await cursor.execute(
+                        """
+                        INSERT INTO bkpm.backend_outbox (conversation_id, platform, platform_unique_id, payload)
+                        VALUES (%s, %s, %s, %s)
+                        """,
+                        (payload["conversation_id"], payload["platform"], payload["platform_unique_id"], Jsonb(payload))
+                    )
+                    await conn.commit()
+                    return payload["conversation_id"]
+        except Exception as e:
+            logger.error(f"Failed to enqueue backend push: {e}")
+            raise DatabaseError("Failed to enqueue backend push")
+
+    async def claim_batch(self, limit: int, lease_seconds: float) -> List[Tuple[int, Dict[str, Any], int]]:
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        WITH candidates AS (
+                            -- One branch per partial index, so dead-lettered rows are never scanned.
+                            (SELECT id FROM bkpm.backend_outbox
+                             WHERE status = 'pending' AND available_at <= NOW()
+                             ORDER BY available_at, id LIMIT %(limit)s)
+                            UNION ALL
+                            (SELECT id FROM bkpm.backend_outbox
+                             WHERE status = 'inflight' AND locked_until < NOW()
+                             ORDER BY locked_until LIMIT %(limit)s)
+                        ),
+                        due AS (
+                            SELECT o.id
+                            FROM bkpm.backend_outbox o
+                            WHERE o.id IN (SELECT id FROM candidates)
+                            AND ((o.status = 'pending' AND o.available_at <= NOW())
+                              OR (o.status = 'inflight' AND o.locked_until < NOW()))
+                            -- An earlier ask of the same user that is backing off or still out with
+                            -- a worker holds this one back, so each user's asks stay in order.
+                            AND NOT EXISTS (
+                                SELECT 1 FROM bkpm.backend_outbox e
+                                WHERE e.platform = o.platform
+                                AND e.platform_unique_id = o.platform_unique_id
+                                AND e.id < o.id
+                                AND e.status IN ('pending', 'inflight')
+                                AND e.id NOT IN (SELECT id FROM candidates)
+                            )
+                            ORDER BY o.id
+                            LIMIT %(limit)s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        UPDATE bkpm.backend_outbox o
+                        SET status = 'inflight',
+                            attempts = o.attempts + 1,
+                            locked_until = NOW() + make_interval(secs => %(lease)s)
+                        FROM due
+                        WHERE o.id = due.id
+                        RETURNING o.id, o.payload, o.attempts
+                        """,
+                        {"limit": limit, "lease": lease_seconds}
+                    )
+                    rows = await cursor.fetchall()
+                    await conn.commit()
+                    return [(row[0], row[1], row[2]) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to claim outbox batch: {e}")
+            return []
+
+    async def mark_sent(self, ids: List[int]):
+        if not ids:
+            return
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("DELETE FROM bkpm.backend_outbox WHERE id = ANY(%s)", (ids,))
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to acknowledge outbox rows {ids}: {e}")
+
+    async def release(self, ids: List[int]):
+        # Hands claimed rows back untried, without spending one of their attempts.
+        if not ids:
+            return
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        UPDATE bkpm.backend_outbox
+                        SET status = 'pending', attempts = attempts - 1, locked_until = NULL
+                        WHERE id = ANY(%s)
+                        """,
+                        (ids,)
+                    )
+                    await conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to release outbox rows {ids}: {e}")
+
+    async def mark_failed(self, ids: List[int], max_attempts: int, max_backoff_seconds: float, error: str) -> int:
+        if not ids:
+            return 0
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        UPDATE bkpm.backend_outbox
+                        SET status = CASE WHEN attempts >= %s THEN 'dead' ELSE 'pending' END,
+                            available_at = NOW() + make_interval(secs => LEAST(%s, power(2, attempts))),
+                            locked_until = NULL,
+                            last_error = %s
+                        WHERE id = ANY(%s)
+                        RETURNING status
+                        """,
+                        (max_attempts, max_backoff_seconds, error, ids)
+                    )
+                    dead = sum(1 for row in await cursor.fetchall() if row[0] == "dead")
+                    await conn.commit()
+                    return dead
+        except Exception as e:
+            logger.error(f"Failed to reschedule outbox rows {ids}: {e}")
+            return 0
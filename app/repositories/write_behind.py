@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from app.repositories.base import Database
+from app.core.exceptions import DatabaseError
+
+logger = logging.getLogger("repo.write_behind")
+
+_CLAIM_SQL = """
+    INSERT INTO bkpm.processed_messages (message_id, platform)
+    SELECT * FROM unnest(%s::text[], %s::text[])
+    ON CONFLICT DO NOTHING
+    RETURNING message_id, platform
+"""
+
+_EMAIL_SQL = """
+    INSERT INTO bkpm.email_metadata (conversation_id, subject, in_reply_to, "references", thread_key)
+    SELECT * FROM unnest(%s::uuid[], %s::text[], %s::text[], %s::text[], %s::text[])
+    ON CONFLICT (conversation_id)
+    DO UPDATE SET
+        subject = EXCLUDED.subject,
+        in_reply_to = EXCLUDED.in_reply_to,
+        "references" = EXCLUDED."references",
+        thread_key = EXCLUDED.thread_key,
+        updated_at = NOW()
+"""
+
+_TOUCH_SQL = """
+    UPDATE bkpm.conversations
+    SET last_activity_at = NOW()
+    WHERE id = ANY(%s::uuid[]) AND end_timestamp IS NULL
+"""
+
+_CLOSE_SQL = """
+    UPDATE bkpm.conversations
+    SET end_timestamp = NOW()
+    WHERE id = ANY(%s::uuid[])
+"""
+
+# Applied in this order within a flush, so a close always lands after a touch of the same session.
+_KINDS = ("claim", "email", "touch", "close")
+
+# What a caller gets back when its write could not be applied, matching the direct repository methods.
+_FAILURES = {"claim": DatabaseError, "email": False, "touch": None, "close": None}
+
+Op = Tuple[str, Any, asyncio.Future]
+
+class WriteBehindBuffer:
+    # Group commit for the small repository writes. Each submitted write gets a future and
+    # waits in memory until max_rows rows are pending or max_delay has passed since the first
+    # one; the whole batch is then applied in one transaction, one statement per kind
+    # (ANY(%s) / unnest). Every kind runs under its own savepoint, and a failing batch is
+    # retried row by row so one bad row only fails its own caller.
+
+    def __init__(self, max_rows: int, max_delay: float):
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay
+        self._pending: List[Op] = []
+        self._rows = 0
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_writes = 0
+        self.max_batch = 0
+        self.row_retries = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name="write-behind")
+
+    async def stop(self):
+        # Flushes whatever is still pending before returning.
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._full.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def submit(self, kind: str, payload: Any) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if self._task is None or self._task.done():
+            self._resolve(future, self._failure(kind))
+            return future
+        self._pending.append((kind, payload, future))
+        self._rows += len(payload[1]) if kind == "claim" else len(payload) if kind == "touch" else 1
+        self._wakeup.set()
+        if self._rows >= self.max_rows:
+            self._full.set()
+        return future
+
+    def _take(self) -> List[Op]:
+        batch, self._pending, self._rows = self._pending, [], 0
+        self._wakeup.clear()
+        self._full.clear()
+        return batch
+
+    async def _run(self):
+        batch: List[Op] = []
+        try:
+            while True:
+                await self._wakeup.wait()
+                if not self._full.is_set():
+                    try:
+                        await asyncio.wait_for(self._full.wait(), self.max_delay)
+                    except asyncio.TimeoutError:
+                        pass
+                batch = self._take()
+                await self._flush(batch)
+                batch = []
+                if self._closing and not self._pending:
+                    return
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Write-behind buffer stopped: {e}")
+        finally:
+            # Nothing is left waiting on a flush that will never come.
+            for kind, _, future in batch + self._take():
+                self._resolve(future, self._failure(kind))
+
+    async def _flush(self, batch: List[Op]):
+        if not batch:
+            return
+        groups: Dict[str, List[Op]] = {}
+        for op in batch:
+            groups.setdefault(op[0], []).append(op)
+
+        results: Dict[asyncio.Future, Any] = {}
+        try:
+            async with Database.get_connection() as conn:
+                async with conn.transaction():
+                    for kind in _KINDS:
+                        if kind in groups:
+                            await self._apply(conn, kind, groups[kind], results)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Write-behind flush of {len(batch)} writes failed: {e}")
+            results = {future: self._failure(kind) for kind, _, future in batch}
+
+        self.flushes += 1
+        self.flushed_writes += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        for future, result in results.items():
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any):
+        if future.done():
+            return
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    def _failure(kind: str) -> Any:
+        failure = _FAILURES[kind]
+        return failure(f"Write-behind {kind} failed") if failure is DatabaseError else failure
+
+    async def _apply(self, conn, kind: str, ops: List[Op], results: Dict[asyncio.Future, Any]):
+        try:
+            async with conn.transaction():
+                await self._execute(conn, kind, ops, results)
+        except Exception as e:
+            if len(ops) == 1:
+                self.errors += 1
+                logger.error(f"Write-behind {kind} failed for {ops[0][1]}: {e}")
+                results[ops[0][2]] = self._failure(kind)
+                return
+            logger.warning(f"Write-behind {kind} batch of {len(ops)} failed, retrying row by row: {e}")
+            self.row_retries += 1
+            for op in ops:
+                await self._apply(conn, kind, [op], results)
+
+    async def _execute(self, conn, kind: str, ops: List[Op], results: Dict[asyncio.Future, Any]):
+        async with conn.cursor() as cursor:
+            if kind == "claim":
+                keys = list(dict.fromkeys((message_id, platform) for _, (platform, ids), _ in ops for message_id in ids))
+                await cursor.execute(_CLAIM_SQL, ([key[0] for key in keys], [key[1] for key in keys]))
+                fresh = {tuple(row) for row in await cursor.fetchall()}
+                # An id claimed by two callers in the same batch goes to the first one.
+                for _, (platform, ids), future in ops:
+                    claimed = {message_id for message_id in ids if (message_id, platform) in fresh}
+                    fresh -= {(message_id, platform) for message_id in claimed}
+                    results[future] = claimed
+
+            elif kind == "email":
+                # ON CONFLICT DO UPDATE cannot touch a row twice in one statement; the last save wins.
+                rows = list({payload[0]: payload for _, payload, _ in ops}.values())
+                await cursor.execute(_EMAIL_SQL, [list(column) for column in zip(*rows)])
+                for _, _, future in ops:
+                    results[future] = True
+
+            elif kind == "touch":
+                ids = list(dict.fromkeys(conversation_id for _, payload, _ in ops for conversation_id in payload))
+                await cursor.execute(_TOUCH_SQL, (ids,))
+                for _, _, future in ops:
+                    results[future] = None
+
+            elif kind == "close":
+                ids = list(dict.fromkeys(payload for _, payload, _ in ops))
+                await cursor.execute(_CLOSE_SQL, (ids,))
+                for _, _, future in ops:
+                    results[future] = None
+                logger.info(f"Sessions {', '.join(ids)} closed successfully.")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_writes": self.flushed_writes,
+            "avg_batch": round(self.flushed_writes / self.flushes, 2) if self.flushes else 0.0,
+            "max_batch": self.max_batch,
+            "row_retries": self.row_retries,
+            "errors": self.errors
+        }
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Optional, Dict, Any, Literal
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -12,6 +13,74 @@ class IncomingMessage(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+@dataclass(slots=True)
+class InboundMessage:
+    # Internal hot-path representation. Pydantic models are only used at the HTTP boundary;
+    # chat events carry their ids in slots and leave metadata unset (email still uses it).
+    platform_unique_id: str
+    query: str
+    platform: str = "generic"
+    conversation_id: Optional[str] = None
+    message_id: Optional[str] = None
+    feedback_payload: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+    @property
+    def is_feedback(self) -> bool:
+        return self.feedback_payload is not None
+
+    @classmethod
+    def from_model(cls, model: IncomingMessage) -> "InboundMessage":
+        metadata = model.metadata or None
+        return cls(
+            platform_unique_id=model.platform_unique_id,
+            query=model.query,
+            platform=model.platform,
+            conversation_id=model.conversation_id,
+            message_id=metadata.get("message_id") if metadata else None,
+            feedback_payload=metadata.get("payload") if metadata and metadata.get("is_feedback") else None,
+            metadata=metadata
+        )
+
+@dataclass(slots=True)
+class ReplyCallback:
+    user_id: str
+    platform: str
+    answer: str
+    conversation_id: Optional[str] = None
+    answer_id: Optional[Any] = None
+    is_helpdesk: bool = False
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any], require_answer: bool = True) -> Optional["ReplyCallback"]:
+        payload = data.get("data") if "data" in data else data
+        if not isinstance(payload, dict):
+            return None
+        user_id = payload.get("user") or payload.get("platform_unique_id") or payload.get("recipient_id") or payload.get("user_id")
+        platform = payload.get("platform")
+        answer = payload.get("answer") or payload.get("message") or ""
+        if not user_id or not platform or (require_answer and not answer):
+            return None
+        return cls(
+            user_id=user_id,
+            platform=platform,
+            answer=answer,
+            conversation_id=payload.get("conversation_id"),
+            answer_id=payload.get("answer_id"),
+            is_helpdesk=payload.get("is_helpdesk", False)
+        )
+
+@dataclass(slots=True)
+class ConversationState:
+    # Latest session of one (platform, user) pair, as seen by the inbound path.
+    conversation_id: Optional[str] = None
+    is_helpdesk: bool = False
+    ended: bool = True
+
+    @property
+    def active_id(self) -> Optional[str]:
+        return None if self.ended else self.conversation_id
+
 class ChatbotResponse(BaseModel):
     success: bool
     answer: Optional[str] = None
@@ -1,20 +1,80 @@
-import httpx
 import asyncio
 from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
 from app.core.config import settings
+from app.core.http import HttpClients
+from app.core.exceptions import QueueFullError, DatabaseError
 from app.schemas.models import ChatbotResponse
+from app.services.limiter import AdaptiveLimiter
+from app.services.breaker import CircuitBreaker
 import logging
 
 logger = logging.getLogger("service.chatbot")
 
+BUSY_MESSAGE = "Mohon maaf, saat ini terdapat peningkatan jumlah pesan yang masuk. Silakan kirim ulang pesan Anda beberapa saat lagi. Terimakasih."
+
 class ChatbotClient:
+    def __init__(self, limiter: Optional[AdaptiveLimiter] = None, breaker: Optional[CircuitBreaker] = None):
+        self.limiter = limiter or AdaptiveLimiter(
+            initial=settings.BACKEND_CONCURRENCY_INITIAL,
+            min_limit=settings.BACKEND_CONCURRENCY_MIN,
+            max_limit=settings.BACKEND_CONCURRENCY_MAX,
+            latency_target=settings.BACKEND_LATENCY_TARGET_SECONDS,
+            max_queue=settings.BACKEND_MAX_QUEUE
+        )
+        self.breaker = breaker or CircuitBreaker(
+            name="backend",
+            failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.BREAKER_RESET_TIMEOUT_SECONDS
+        )
+        self._tasks: Set[asyncio.Task] = set()
+        self.shed = 0
+        self.outbox = None
+
+    def attach_outbox(self, outbox):
+        self.outbox = outbox
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if settings.BACKEND_API_KEY:
+            headers["X-API-Key"] = settings.BACKEND_API_KEY
+        return headers
 
-    async def _fire_request(self, url: str, payload: dict, headers: dict):
+    async def deliver(self, payload: dict) -> bool:
+        return await self._fire_request(settings.BACKEND_ASK_URL, payload, self._headers())
+
+    async def _fire_request(self, url: str, payload: dict, headers: dict) -> bool:
+        try:
+            await self.limiter.acquire()
+        except QueueFullError as e:
+            logger.error(f"Backend request dropped: {e}")
+            self.breaker.release()
+            return False
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        ok = False
         try:
-            async with httpx.AsyncClient(timeout=None) as client:
-                await client.post(url, json=payload, headers=headers)
+            client = HttpClients.for_url(url)
+            response = await client.post(url, json=payload, headers=headers, timeout=settings.BACKEND_ASK_TIMEOUT_SECONDS)
+            ok = response.status_code < 500 and response.status_code != 429
+            if not ok:
+                logger.error(f"Backend request failed: {response.status_code}")
         except Exception as e:
             logger.error(f"Background request failed: {e}")
+        finally:
+            self.limiter.release(loop.time() - started, ok)
+            if ok:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        return ok
+
+    def is_overloaded(self) -> bool:
+        if self.limiter.queue_depth >= settings.OVERLOAD_QUEUE_THRESHOLD or not self.breaker.allow():
+            self.shed += 1
+            return True
+        return False
 
     async def ask(self, query: str, conversation_id: str, platform: str, user_id: str) -> bool:
         start_timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
@@ -25,22 +85,60 @@ class ChatbotClient:
             "platform": platform,
             "platform_unique_id": user_id,
             "conversation_id": safe_conv_id,
-            "start_timestamp": start_timestamp 
+            "start_timestamp": start_timestamp
         }
-        
-        headers = {"Content-Type": "application/json"}
-        if settings.BACKEND_API_KEY:
-            headers["X-API-Key"] = settings.BACKEND_API_KEY
 
+        headers = self._headers()
         url = settings.BACKEND_ASK_URL
-        
-        logger.info(f"PUSH TO BACKEND: {url} | ConvID: {safe_conv_id}")
-        
+
+        # Whatever is_overloaded() let through must reach the backend, or give its probe back.
+        dispatched = False
         try:
-            asyncio.create_task(self._fire_request(url, payload, headers))
-            
-            return True
+            if self.outbox:
+                try:
+                    safe_conv_id = await self.outbox.enqueue(payload, resolve_active=platform != "email")
+                    logger.info(f"QUEUED TO OUTBOX | ConvID: {safe_conv_id}")
+                    dispatched = True
+                    return True
+                except DatabaseError:
+                    logger.warning(f"Outbox unavailable, pushing directly | ConvID: {safe_conv_id}")
 
-        except Exception as e:
-            logger.error(f"Failed to create background task: {e}")
-            return False
\ No newline at end of file
+            if not self.limiter.has_capacity():
+                logger.error(f"Backend queue full, rejecting push for ConvID: {safe_conv_id}")
+                return False
+
+            logger.info(f"PUSH TO BACKEND: {url} | ConvID: {safe_conv_id}")
+
+            try:
+                task = asyncio.create_task(self._fire_request(url, payload, headers))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+                dispatched = True
+                return True
+
+            except Exception as e:
+                logger.error(f"Failed to create background task: {e}")
+                return False
+        finally:
+            if not dispatched:
+                self.breaker.release()
+
+    async def close(self, timeout: float = 10.0):
+        if not self._tasks:
+            return
+        pending = list(self._tasks)
+        _, still_running = await asyncio.wait(pending, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        if still_running:
+            logger.warning(f"Cancelled {len(still_running)} unfinished backend requests on shutdown")
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.limiter.get_stats(),
+            "tracked_tasks": len(self._tasks),
+            "shed": self.shed,
+            "breaker": self.breaker.get_stats()
+        }
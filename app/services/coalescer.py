@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from app.core.exceptions import QueueFullError
+from app.schemas.models import InboundMessage
+from app.services.dispatcher import MessageDispatcher
+
+logger = logging.getLogger("service.coalescer")
+
+FlushCallback = Callable[[InboundMessage], Awaitable[None]]
+
+@dataclass
+class _PendingBurst:
+    first_at: float
+    flush: FlushCallback
+    messages: List[InboundMessage] = field(default_factory=list)
+    timer: Optional[asyncio.Task] = None
+
+class MessageCoalescer:
+    # Debounces consecutive messages per user. Every new message restarts the
+    # window, but a burst is never held longer than max_wait after its first message.
+
+    def __init__(
+        self,
+        window: float,
+        max_wait: float,
+        max_messages: int,
+        max_chars: int,
+        dispatcher: Optional[MessageDispatcher] = None,
+        enqueue_timeout: Optional[float] = None
+    ):
+        self.window = window
+        self.max_wait = max(max_wait, window)
+        self.max_messages = max(1, max_messages)
+        self.max_chars = max_chars
+        self.dispatcher = dispatcher
+        self.enqueue_timeout = enqueue_timeout
+        self._pending: Dict[str, _PendingBurst] = {}
+        self._flushing: Set[asyncio.Task] = set()
+        self.bursts = 0
+        self.merged_messages = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    @staticmethod
+    def _key(msg: InboundMessage) -> str:
+        return f"{msg.platform}:{msg.platform_unique_id}"
+
+    async def submit(self, msg: InboundMessage, flush: FlushCallback):
+        loop = asyncio.get_running_loop()
+        key = self._key(msg)
+        burst = self._pending.get(key)
+
+        if burst is None:
+            burst = _PendingBurst(first_at=loop.time(), flush=flush)
+            self._pending[key] = burst
+        elif burst.timer:
+            burst.timer.cancel()
+
+        burst.messages.append(msg)
+
+        if len(burst.messages) >= self.max_messages:
+            self._pending.pop(key, None)
+            await self._flush(burst)
+            return
+
+        remaining = burst.first_at + self.max_wait - loop.time()
+        delay = max(0.0, min(self.window, remaining))
+        burst.timer = asyncio.create_task(self._flush_after(key, burst, delay))
+
+    async def _flush_after(self, key: str, burst: _PendingBurst, delay: float):
+        await asyncio.sleep(delay)
+        if self._pending.get(key) is not burst:
+            return
+        del self._pending[key]
+
+        # Run the flush outside the timer task so a later submit() cannot cancel it midway.
+        task = asyncio.create_task(self._dispatch_flush(key, burst))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _dispatch_flush(self, key: str, burst: _PendingBurst):
+        # The timer fires outside the dispatcher. Queue the flush on the user's partition so it
+        # runs in order with that user's later events instead of racing them.
+        if self.dispatcher and self.dispatcher.is_running:
+            try:
+                await self.dispatcher.submit(key, self._flush, burst, timeout=self.enqueue_timeout)
+                return
+            except QueueFullError as e:
+                logger.warning(f"{e}, flushing coalesced burst for {key} directly")
+        await self._flush(burst)
+
+    def _merge(self, messages: List[InboundMessage]) -> InboundMessage:
+        if len(messages) == 1:
+            return messages[0]
+        # Keep the first message's conversation: a new user gets a fresh id per message
+        # until the backend persists the session, and the burst must land in one of them.
+        query = "\n".join(m.query for m in messages if m.query)[:self.max_chars]
+        return replace(messages[0], query=query, message_id=messages[-1].message_id)
+
+    async def _flush(self, burst: _PendingBurst):
+        merged = self._merge(burst.messages)
+        self.bursts += 1
+        self.merged_messages += len(burst.messages)
+        if len(burst.messages) > 1:
+            logger.info(f"Coalesced {len(burst.messages)} messages for conversation {merged.conversation_id}")
+        try:
+            await burst.flush(merged)
+        except Exception as e:
+            logger.error(f"Coalesced flush failed for conversation {merged.conversation_id}: {e}")
+
+    async def close(self):
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for burst in pending:
+            if burst.timer:
+                burst.timer.cancel()
+        await asyncio.gather(*(self._flush(burst) for burst in pending), *self._flushing, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "window_seconds": self.window,
+            "pending_conversations": len(self._pending),
+            "bursts": self.bursts,
+            "merged_messages": self.merged_messages
+        }
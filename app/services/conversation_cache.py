@@ -0,0 +1,123 @@
+import asyncio
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import psycopg
+from psycopg import sql
+from app.repositories.base import Database
+from app.schemas.models import ConversationState
+
+logger = logging.getLogger("service.conversation_cache")
+
+class ConversationStateCache:
+    # LRU + TTL cache of (platform, user) -> ConversationState. Entries are only served
+    # while the LISTEN connection is up; a trigger on bkpm.conversations notifies
+    # "<platform>:<platform_unique_id>" whenever a session is opened, closed or escalated.
+    # Any gap in the subscription clears the cache, since notifications may have been missed.
+
+    def __init__(self, max_entries: int, ttl: float, channel: str = "bkpm_conversations", reconnect_delay: float = 5.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._entries: "OrderedDict[str, Tuple[float, ConversationState]]" = OrderedDict()
+        self._version = 0
+        self._listening = False
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(platform: str, platform_unique_id: str) -> str:
+        return f"{platform}:{platform_unique_id}"
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, platform: str, platform_unique_id: str) -> Optional[ConversationState]:
+        if not self._listening:
+            self.misses += 1
+            return None
+
+        key = self.key(platform, platform_unique_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, platform: str, platform_unique_id: str, state: ConversationState, version: int):
+        # `version` is read before the DB lookup; if anything was invalidated since, the
+        # loaded state may already be stale, so it is not stored.
+        if not self._listening or version != self._version:
+            return
+
+        key = self.key(platform, platform_unique_id)
+        self._entries[key] = (time.monotonic() + self.ttl, state)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, platform: str, platform_unique_id: str):
+        self._drop(self.key(platform, platform_unique_id))
+
+    def _drop(self, key: str):
+        self._version += 1
+        self.invalidations += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._version += 1
+        self._entries.clear()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(), name="conversation-cache-listener")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._listening = False
+        self.clear()
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(Database.conninfo(), autocommit=True, **Database.conn_args) as conn:
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self.clear()
+                    self._listening = True
+                    logger.info(f"Conversation cache listening on '{self.channel}'")
+                    async for notify in conn.notifies():
+                        self._drop(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Conversation cache listener error: {e}")
+            finally:
+                self._listening = False
+                self.clear()
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "listening": self._listening,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions
+        }
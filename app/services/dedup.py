@@ -0,0 +1,102 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Set
+from app.core.exceptions import DatabaseError
+from app.repositories.message import MessageRepository
+from app.schemas.models import InboundMessage
+
+logger = logging.getLogger("service.dedup")
+
+class DedupService:
+    # Two tiers: an in-process LRU of recently seen ids answers most redeliveries without
+    # touching the DB, and everything else is claimed in bkpm.processed_messages with one
+    # INSERT ... ON CONFLICT DO NOTHING per batch, which is what makes it safe across replicas.
+    # If the DB is unavailable the batch is let through: a duplicate answer is better than
+    # silently dropping a user's message.
+
+    def __init__(self, repo: MessageRepository, max_entries: int):
+        self.repo = repo
+        self.max_entries = max(1, max_entries)
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.accepted = 0
+        self.errors = 0
+
+    def _remember(self, key: str):
+        self._seen[key] = None
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    async def claim(self, platform: str, message_ids: Sequence[str]) -> Set[str]:
+        candidates = []
+        for message_id in dict.fromkeys(message_ids):
+            key = f"{platform}:{message_id}"
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                self.memory_hits += 1
+            else:
+                candidates.append(message_id)
+
+        if not candidates:
+            return set()
+
+        try:
+            claimed = await self.repo.claim_message_ids(platform, candidates)
+        except DatabaseError:
+            self.errors += 1
+            logger.warning(f"Dedup store unavailable, accepting {len(candidates)} {platform} messages unchecked")
+            claimed = set(candidates)
+
+        for message_id in candidates:
+            self._remember(f"{platform}:{message_id}")
+        self.db_hits += len(candidates) - len(claimed)
+        self.accepted += len(claimed)
+        return claimed
+
+    async def filter_messages(self, messages: List[InboundMessage]) -> List[InboundMessage]:
+        by_platform: Dict[str, List[str]] = {}
+        for msg in messages:
+            if msg.message_id:
+                by_platform.setdefault(msg.platform, []).append(msg.message_id)
+
+        claimed: Set[tuple] = set()
+        for platform, message_ids in by_platform.items():
+            claimed.update((platform, message_id) for message_id in await self.claim(platform, message_ids))
+
+        fresh = []
+        for msg in messages:
+            if not msg.message_id:
+                fresh.append(msg)
+            elif (msg.platform, msg.message_id) in claimed:
+                # Claimed once, so a repeat of the id inside the same payload is dropped.
+                claimed.discard((msg.platform, msg.message_id))
+                fresh.append(msg)
+            else:
+                logger.info(f"Duplicate {msg.platform} message dropped: {msg.message_id}")
+        return fresh
+
+    async def release(self, platform: str, message_ids: Sequence[str]):
+        # Undo a claim for messages that were not accepted for processing, so the sender's
+        # retry is not mistaken for a duplicate.
+        for message_id in message_ids:
+            self._seen.pop(f"{platform}:{message_id}", None)
+        await self.repo.release_message_ids(platform, list(message_ids))
+
+    async def release_messages(self, messages: List[InboundMessage]):
+        by_platform: Dict[str, List[str]] = {}
+        for msg in messages:
+            if msg.message_id:
+                by_platform.setdefault(msg.platform, []).append(msg.message_id)
+        for platform, message_ids in by_platform.items():
+            await self.release(platform, message_ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cached_ids": len(self._seen),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "accepted": self.accepted,
+            "errors": self.errors
+        }
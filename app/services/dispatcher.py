@@ -0,0 +1,110 @@
+import asyncio
+import zlib
+import logging
+import concurrent.futures
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.exceptions import QueueFullError
+
+logger = logging.getLogger("service.dispatcher")
+
+class MessageDispatcher:
+    # Each partition has one bounded queue and one worker. A key always hashes to the
+    # same partition, so jobs for one conversation run in submission order.
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(queue), name=f"dispatch-worker-{i}")
+            for i, queue in enumerate(self._queues)
+        ]
+        logger.info(f"Message Dispatcher started with {self.workers} workers (queue size {self.queue_size})")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)),
+                timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Dispatcher drain timed out, dropping {self.queue_depth} queued jobs")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+        logger.info("Message Dispatcher stopped")
+
+    def _partition(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.workers
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            func, args = await queue.get()
+            try:
+                await func(*args)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Dispatch job {getattr(func, '__name__', func)} failed: {e}")
+            finally:
+                queue.task_done()
+
+    async def submit(self, key: str, func: Callable[..., Awaitable[Any]], *args, timeout: Optional[float] = None):
+        if not self._tasks:
+            raise QueueFullError("Dispatcher is not running")
+
+        queue = self._queues[self._partition(key)]
+        try:
+            if timeout is None:
+                await queue.put((func, args))
+            else:
+                await asyncio.wait_for(queue.put((func, args)), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFullError(f"Dispatch queue for {key} is full")
+
+    def submit_threadsafe(self, key: str, func: Callable[..., Awaitable[Any]], *args, timeout: Optional[float] = None) -> concurrent.futures.Future:
+        if self._loop is None:
+            raise QueueFullError("Dispatcher is not running")
+        return asyncio.run_coroutine_threadsafe(self.submit(key, func, *args, timeout=timeout), self._loop)
+
+    def call_threadsafe(self, func: Callable[..., Awaitable[Any]], *args) -> concurrent.futures.Future:
+        # Runs a coroutine directly on the dispatcher's loop, bypassing the partitions.
+        if self._loop is None:
+            raise QueueFullError("Dispatcher is not running")
+        return asyncio.run_coroutine_threadsafe(func(*args), self._loop)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue_depth,
+            "partition_depths": [queue.qsize() for queue in self._queues],
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+import psycopg
+from app.repositories.base import Database
+
+logger = logging.getLogger("service.leader")
+
+_elections: Dict[str, "LeaderElection"] = {}
+
+class LeaderElection:
+    # Runs `job` on the one instance holding a session advisory lock; the lock dies with the
+    # holder's connection, and a failed heartbeat cancels the job.
+
+    def __init__(self, name: str, job: Callable[[], Awaitable[Any]], retry_interval: float, heartbeat_interval: float):
+        self.name = name
+        self.job = job
+        self.lock_key = f"bkpm.leader.{name}"
+        self.retry_interval = retry_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.is_leader = False
+        self.elections = 0
+        self.losses = 0
+        self._task: Optional[asyncio.Task] = None
+        _elections[name] = self
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"leader-{self.name}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(Database.conninfo(), autocommit=True, **Database.conn_args) as conn:
+                    while True:
+                        cursor = await conn.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (self.lock_key,))
+                        if (await cursor.fetchone())[0]:
+                            await self._lead(conn)
+                            await conn.execute("SELECT pg_advisory_unlock(hashtext(%s))", (self.lock_key,))
+                        await asyncio.sleep(self.retry_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Leader election '{self.name}' connection error: {e}")
+
+            await asyncio.sleep(self.retry_interval)
+
+    async def _lead(self, conn: psycopg.AsyncConnection):
+        self.is_leader = True
+        self.elections += 1
+        logger.info(f"This instance now runs '{self.name}'")
+        job = asyncio.create_task(self.job(), name=self.name)
+        try:
+            while True:
+                done, _ = await asyncio.wait({job}, timeout=self.heartbeat_interval)
+                if done:
+                    if not job.cancelled() and job.exception():
+                        logger.error(f"'{self.name}' stopped with an error: {job.exception()}")
+                    else:
+                        logger.warning(f"'{self.name}' finished, releasing leadership")
+                    return
+                await asyncio.wait_for(conn.execute("SELECT 1"), self.heartbeat_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.losses += 1
+            logger.warning(f"Lost the '{self.name}' lock connection, stopping the job")
+            raise
+        finally:
+            self.is_leader = False
+            job.cancel()
+            await asyncio.gather(job, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "leader": self.is_leader,
+            "elections": self.elections,
+            "losses": self.losses
+        }
+
+def get_leader_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: election.get_stats() for name, election in _elections.items()}
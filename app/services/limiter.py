@@ -0,0 +1,143 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Any, Deque, Dict
+from app.core.exceptions import QueueFullError
+
+logger = logging.getLogger("service.limiter")
+
+class AdaptiveLimiter:
+    # AIMD concurrency limit: every healthy completion grows the limit by roughly one
+    # slot per round trip, while an error or a response slower than the latency target
+    # shrinks it by `backoff` (at most once per cooldown, so one burst of failures does
+    # not collapse it to the floor). Callers over the limit wait in a FIFO queue.
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        max_queue: int,
+        backoff: float = 0.7,
+        cooldown: float = 1.0
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.latency_target = latency_target
+        self.max_queue = max_queue
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self.completed = 0
+        self.errors = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def has_capacity(self) -> bool:
+        return self.inflight < int(self.limit) or len(self._waiters) < self.max_queue
+
+    async def acquire(self):
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"Limiter queue is full ({self.max_queue})")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before cancellation; give it back.
+                self.inflight -= 1
+                self._wake()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, latency: float, ok: bool):
+        self.inflight -= 1
+        self.completed += 1
+
+        if not ok or latency > self.latency_target:
+            if not ok:
+                self.errors += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                previous = self.limit
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                if int(previous) != int(self.limit):
+                    logger.warning(f"Backend limit decreased {int(previous)} -> {int(self.limit)} (ok={ok}, latency={latency:.1f}s)")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "errors": self.errors,
+            "rejected": self.rejected
+        }
+
+class RateLimiter:
+    # Token bucket: on average `rate` acquisitions per second, with bursts of up to `burst`.
+    # Waiters are served in arrival order; a rate of 0 or less means unlimited.
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.throttled = 0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            self.acquired += 1
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                self.throttled += 1
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+            self.acquired += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.rate,
+            "acquired": self.acquired,
+            "throttled": self.throttled
+        }
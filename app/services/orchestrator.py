@@ -1,13 +1,19 @@
-import httpx
 import uuid
 import re
-from typing import Dict, Optional
-from app.schemas.models import IncomingMessage
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.schemas.models import ConversationState, InboundMessage, ReplyCallback
 from app.repositories.conversation import ConversationRepository
 from app.repositories.message import MessageRepository
-from app.services.chatbot import ChatbotClient
+from app.services.chatbot import ChatbotClient, BUSY_MESSAGE
+from app.services.coalescer import MessageCoalescer
+from app.services.conversation_cache import ConversationStateCache
+from app.services.session_timer import SessionTimer
 from app.adapters.base import BaseAdapter
+from app.adapters.utils import ParagraphAccumulator
 from app.core.config import settings
+from app.core.http import HttpClients
+from app.core.exceptions import DatabaseError
 import logging
 
 logger = logging.getLogger("service.orchestrator")
@@ -18,19 +24,25 @@ class MessageOrchestrator:
         repo_conv: ConversationRepository,
         repo_msg: MessageRepository,
         chatbot: ChatbotClient,
-        adapters: Dict[str, BaseAdapter]
+        adapters: Dict[str, BaseAdapter],
+        coalescer: Optional[MessageCoalescer] = None,
+        state_cache: Optional[ConversationStateCache] = None,
+        session_timer: Optional[SessionTimer] = None
     ):
         self.repo_conv = repo_conv
         self.repo_msg = repo_msg
         self.chatbot = chatbot
         self.adapters = adapters
+        self.coalescer = coalescer
+        self.state_cache = state_cache
+        self.session_timer = session_timer
 
     async def timeout_session(self, conversation_id: str, platform: str, user_id: str):
         adapter = self.adapters.get(platform)
         if not adapter: 
             return
         
-        if self.repo_conv.is_helpdesk_session(conversation_id):
+        if await self.repo_conv.is_helpdesk_session(conversation_id):
             logger.info(f"SKIP TIMEOUT: Session {conversation_id} is helpdesk session (agent handling)")
             return
             
@@ -54,7 +66,7 @@ class MessageOrchestrator:
         send_kwargs = {}
         if platform == "email":
             send_kwargs = {"subject": "Session Ended"}
-            meta = self.repo_msg.get_email_metadata(conversation_id)
+            meta = await self.repo_msg.get_email_metadata(conversation_id)
             if meta:
                 if settings.EMAIL_PROVIDER == "azure_oauth2":
                     send_kwargs["graph_message_id"] = meta.get("graph_message_id")
@@ -62,10 +74,14 @@ class MessageOrchestrator:
                     send_kwargs.update(meta)
 
         await adapter.send_message(user_id, closing_text, **send_kwargs)
-        self.repo_conv.close_session(conversation_id)
+        await self.repo_conv.close_session(conversation_id)
+        if self.state_cache:
+            self.state_cache.invalidate(platform, user_id)
+        if self.session_timer:
+            self.session_timer.cancel(conversation_id)
 
-    async def handle_feedback(self, msg: IncomingMessage):
-        payload_str = msg.metadata.get("payload", "")
+    async def handle_feedback(self, msg: InboundMessage):
+        payload_str = msg.feedback_payload or ""
         if "-" not in payload_str: 
             return
         try:
@@ -73,7 +89,12 @@ class MessageOrchestrator:
         except ValueError: 
             return
         is_good = "good" in feedback_type_raw.lower()
-        session_id = msg.conversation_id or self.repo_conv.get_latest_id(msg.platform_unique_id, msg.platform)
+        session_id = msg.conversation_id
+        if not session_id:
+            try:
+                session_id = (await self._get_conversation_state(msg)).conversation_id
+            except DatabaseError:
+                return
         if not session_id: 
             return
         backend_payload = {
@@ -86,16 +107,16 @@ class MessageOrchestrator:
         if settings.BACKEND_API_KEY: 
             headers["X-API-Key"] = settings.BACKEND_API_KEY
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                await client.post(url, json=backend_payload, headers=headers)
+            client = HttpClients.for_url(url)
+            await client.post(url, json=backend_payload, headers=headers, timeout=settings.BACKEND_FEEDBACK_TIMEOUT_SECONDS)
         except Exception as e:
             logger.error(f"Gagal kirim feedback: {e}")
 
-    def _get_email_send_kwargs(self, conversation_id: str) -> Dict:
+    async def _get_email_send_kwargs(self, conversation_id: str) -> Dict:
         if not conversation_id:
             return {"subject": "Re: Your Inquiry"}
             
-        meta = self.repo_msg.get_email_metadata(conversation_id)
+        meta = await self.repo_msg.get_email_metadata(conversation_id)
         if meta: 
             if settings.EMAIL_PROVIDER == "azure_oauth2":
                 return {
@@ -110,85 +131,223 @@ class MessageOrchestrator:
             
         return {"subject": "Re: Your Inquiry"}
 
-    async def send_manual_message(self, data: dict):
-        payload = data.get("data") if "data" in data else data
-        user_id = payload.get("user") or payload.get("platform_unique_id") or payload.get("recipient_id") or payload.get("user_id")
-        platform = payload.get("platform")
-        answer = payload.get("answer") or payload.get("message")
-        conversation_id = payload.get("conversation_id")
-        answer_id = payload.get("answer_id")
-        is_helpdesk = payload.get("is_helpdesk", False)
-        
-        if not user_id or not answer or not platform: 
-            logger.warning(f"Invalid callback payload: {payload}")
-            return
-            
-        adapter = self.adapters.get(platform)
+    async def send_manual_message(self, data: dict) -> Dict[str, Any]:
+        reply = ReplyCallback.from_payload(data)
+        if not reply: 
+            logger.warning(f"Invalid callback payload: {data}")
+            return {"status": "invalid"}
+        self._observe_backend_reply(reply)
+        return await self.send_reply(reply)
+
+    def _observe_backend_reply(self, reply: ReplyCallback):
+        # The backend answers with the busy text when it is saturated; count it against the breaker.
+        if BUSY_MESSAGE in reply.answer:
+            self.chatbot.breaker.record_failure()
+
+    async def send_reply(self, reply: ReplyCallback) -> Dict[str, Any]:
+        adapter = self.adapters.get(reply.platform)
         if not adapter: 
-            return
+            return {"status": "unsupported_platform"}
         
         send_kwargs = {}
-        if platform == "email":
-            send_kwargs = self._get_email_send_kwargs(conversation_id)
-        
-        await adapter.send_message(user_id, answer, **send_kwargs)
+        if reply.platform == "email":
+            send_kwargs = await self._get_email_send_kwargs(reply.conversation_id)
         
+        result = await adapter.send_message(reply.user_id, reply.answer, **send_kwargs)
+        await self._finish_reply(adapter, reply)
+
+        return {"status": "sent" if self._was_sent(result) else "failed"}
+
+    @staticmethod
+    def _was_sent(result: Optional[Dict[str, Any]]) -> bool:
+        return bool(result) and bool(result.get("sent", result.get("success", False)))
+
+    async def _finish_reply(self, adapter: BaseAdapter, reply: ReplyCallback):
         try: 
-            await adapter.send_typing_off(user_id)
+            await adapter.send_typing_off(reply.user_id)
         except Exception: 
             pass
+
+        await self._touch_activity(reply.platform, reply.conversation_id, reply.user_id)
         
-        is_busy_message = "Mohon maaf, saat ini terdapat peningkatan jumlah pesan yang masuk. Silakan kirim ulang pesan Anda beberapa saat lagi. Terimakasih." in answer
+        is_busy_message = BUSY_MESSAGE in reply.answer
         
-        if answer_id and not is_helpdesk and not is_busy_message: 
-            await adapter.send_feedback_request(user_id, answer_id)
+        if reply.answer_id and not reply.is_helpdesk and not is_busy_message: 
+            await adapter.send_feedback_request(reply.user_id, reply.answer_id)
+
+    async def relay_stream(self, events: AsyncIterator[Dict[str, Any]], min_chars: int, max_chars: int) -> Dict[str, Any]:
+        reply: Optional[ReplyCallback] = None
+        adapter: Optional[BaseAdapter] = None
+        accumulator = ParagraphAccumulator(min_chars, max_chars)
+        streaming = False
+        answer_parts: List[str] = []
+        segments = 0
+        failed = 0
+
+        async for event in events:
+            deltas: List[str] = []
+            if reply is None:
+                reply = ReplyCallback.from_payload(event, require_answer=False)
+                if not reply:
+                    logger.warning(f"Invalid stream header: {event}")
+                    return {"status": "invalid"}
+                adapter = self.adapters.get(reply.platform)
+                if not adapter:
+                    return {"status": "unsupported_platform"}
+                # Email replies are one message per answer, so they are buffered and sent whole.
+                streaming = reply.platform in ("whatsapp", "instagram")
+                # The header may already carry the start of the answer.
+                if reply.answer:
+                    deltas.append(reply.answer)
+
+            if event.get("answer_id") is not None:
+                reply.answer_id = event["answer_id"]
+            if event.get("is_helpdesk") is not None:
+                reply.is_helpdesk = bool(event["is_helpdesk"])
+
+            delta = event.get("delta") or event.get("chunk")
+            if delta:
+                deltas.append(delta)
+
+            for delta in deltas:
+                answer_parts.append(delta)
+                if not streaming:
+                    continue
+                for segment in accumulator.feed(delta):
+                    if not self._was_sent(await adapter.send_message(reply.user_id, segment)):
+                        failed += 1
+                    segments += 1
+                    try:
+                        await adapter.send_typing_on(reply.user_id)
+                    except Exception:
+                        pass
+
+        if reply is None:
+            return {"status": "invalid"}
+
+        reply.answer = "".join(answer_parts)
+        if not reply.answer:
+            return {"status": "empty"}
+
+        if not streaming:
+            result = await self.send_reply(reply)
+            result["segments"] = 1
+            return result
+
+        for segment in accumulator.flush():
+            if not self._was_sent(await adapter.send_message(reply.user_id, segment)):
+                failed += 1
+            segments += 1
+
+        await self._finish_reply(adapter, reply)
+        if failed:
+            logger.error(f"Failed to send {failed} of {segments} streamed segments to {reply.platform} user {reply.user_id}")
+            return {"status": "failed", "segments": segments, "failed_segments": failed}
+        logger.info(f"Relayed streamed answer to {reply.platform} user {reply.user_id} in {segments} segments")
+        return {"status": "sent", "segments": segments}
 
-    def _check_helpdesk_session(self, msg: IncomingMessage) -> Optional[str]:
+    async def _send_reply_group(self, items: List[Tuple[int, ReplyCallback]], results: List[Dict[str, Any]], semaphore: asyncio.Semaphore):
+        async with semaphore:
+            for index, reply in items:
+                try:
+                    results[index] = await self.send_reply(reply)
+                except Exception as e:
+                    logger.error(f"Batch reply to {reply.user_id} failed: {e}")
+                    results[index] = {"status": "failed", "error": str(e)}
+
+    async def send_reply_batch(self, items: List[dict], concurrency: int) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = [{"status": "invalid"} for _ in items]
+
+        # Replies to the same recipient are sent in order; recipients are fanned out concurrently.
+        groups: Dict[str, List[Tuple[int, ReplyCallback]]] = {}
+        for index, data in enumerate(items):
+            reply = ReplyCallback.from_payload(data) if isinstance(data, dict) else None
+            if not reply:
+                continue
+            self._observe_backend_reply(reply)
+            groups.setdefault(f"{reply.platform}:{reply.user_id}", []).append((index, reply))
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        await asyncio.gather(*(self._send_reply_group(group, results, semaphore) for group in groups.values()))
+        return results
+
+    async def _get_conversation_state(self, msg: InboundMessage) -> ConversationState:
+        version = self.state_cache.version if self.state_cache else 0
+        cached = self.state_cache.get(msg.platform, msg.platform_unique_id) if self.state_cache else None
+        if cached:
+            return cached
+
+        state = await self.repo_conv.get_conversation_state(msg.platform_unique_id, msg.platform)
+        if self.state_cache:
+            self.state_cache.put(msg.platform, msg.platform_unique_id, state, version)
+        return state
+
+    async def prefetch_conversation_states(self, messages: List[InboundMessage]):
+        # Warms the state cache for a multi-message webhook with one pipelined round trip,
+        # so the dispatch workers do not each query bkpm.conversations.
+        if not self.state_cache:
+            return
+        version = self.state_cache.version
+        keys = list({
+            (msg.platform_unique_id, msg.platform) for msg in messages
+            if msg.platform != "email" and not self.state_cache.get(msg.platform, msg.platform_unique_id)
+        })
+        if len(keys) < 2:
+            return
+        try:
+            states = await self.repo_conv.get_conversation_states(keys)
+        except DatabaseError:
+            return
+        for (platform_id, platform), state in zip(keys, states):
+            self.state_cache.put(platform, platform_id, state, version)
+
+    def _check_helpdesk_session(self, msg: InboundMessage, state: ConversationState) -> Optional[str]:
         if msg.platform == "email":
             return None  
             
-        active_id = self.repo_conv.get_active_id(msg.platform_unique_id, msg.platform)
+        active_id = state.active_id
         
         if active_id:
-            if self.repo_conv.is_helpdesk_session(active_id):
+            if state.is_helpdesk:
                 logger.info(f"User {msg.platform_unique_id} has active helpdesk session: {active_id}")
                 return active_id
         
         return None
 
-    def _ensure_conversation_id(self, msg: IncomingMessage):
+    async def _ensure_conversation_id(self, msg: InboundMessage):
         if msg.platform == "email":
-            self._handle_email_conversation_id(msg)
+            await self._handle_email_conversation_id(msg)
             return
 
-        helpdesk_session_id = self._check_helpdesk_session(msg)
+        state = await self._get_conversation_state(msg)
+        helpdesk_session_id = self._check_helpdesk_session(msg, state)
         if helpdesk_session_id:
             msg.conversation_id = helpdesk_session_id
             logger.info(f"Continuing helpdesk session {helpdesk_session_id}")
             return
 
         if not msg.conversation_id:
-            msg.conversation_id = self.repo_conv.get_active_id(msg.platform_unique_id, msg.platform)
+            msg.conversation_id = state.active_id
 
         if not msg.conversation_id:
             msg.conversation_id = str(uuid.uuid4())
             logger.info(f"Created new session {msg.conversation_id} for {msg.platform_unique_id}")
 
-    def _handle_email_conversation_id(self, msg: IncomingMessage):
+    async def _handle_email_conversation_id(self, msg: InboundMessage):
         if not msg.metadata:
             msg.conversation_id = str(uuid.uuid4())
             return
 
         if settings.EMAIL_PROVIDER == "azure_oauth2":
-            self._handle_azure_email_thread(msg)
+            await self._handle_azure_email_thread(msg)
         else:
-            self._handle_standard_email_thread(msg)
+            await self._handle_standard_email_thread(msg)
 
-    def _handle_azure_email_thread(self, msg: IncomingMessage):
+    async def _handle_azure_email_thread(self, msg: InboundMessage):
         azure_conv_id = msg.metadata.get("conversation_id")
         
         if azure_conv_id:
-            existing_id = self.repo_msg.get_conversation_by_azure_thread(azure_conv_id)
+            existing_id = await self.repo_msg.get_conversation_by_azure_thread(azure_conv_id)
             
             if existing_id:
                 msg.conversation_id = existing_id
@@ -197,10 +356,10 @@ class MessageOrchestrator:
         else:
             msg.conversation_id = str(uuid.uuid4())
 
-    def _handle_standard_email_thread(self, msg: IncomingMessage):
+    async def _handle_standard_email_thread(self, msg: InboundMessage):
         thread_key = msg.metadata.get("thread_key")
         if thread_key:
-            existing_id = self.repo_msg.get_conversation_by_thread(thread_key)
+            existing_id = await self.repo_msg.get_conversation_by_thread(thread_key)
             if existing_id:
                 msg.conversation_id = existing_id
                 return
@@ -212,24 +371,46 @@ class MessageOrchestrator:
         seed = f"{sender}|{clean_subject}"
         msg.conversation_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, seed))
 
-    async def process_message(self, msg: IncomingMessage):
+    async def process_message(self, msg: InboundMessage):
         adapter = self.adapters.get(msg.platform)
         if not adapter: 
             return
 
         if not msg.conversation_id:
-            self._ensure_conversation_id(msg)
+            await self._ensure_conversation_id(msg)
 
-        self._save_email_metadata(msg)
+        await self._save_email_metadata(msg)
+        await self._touch_activity(msg.platform, msg.conversation_id, msg.platform_unique_id)
 
         try:
-            msg_id = msg.metadata.get("message_id") if msg.metadata else None
+            msg_id = msg.message_id
             await adapter.send_typing_on(msg.platform_unique_id, message_id=msg_id)
             if msg.platform == "whatsapp" and msg_id and hasattr(adapter, 'mark_as_read'):
                 await adapter.mark_as_read(msg_id)
         except Exception: 
             pass
 
+        if self.coalescer and self.coalescer.enabled and msg.platform != "email":
+            await self.coalescer.submit(msg, self._push_to_backend)
+            return
+
+        await self._push_to_backend(msg)
+
+    async def _push_to_backend(self, msg: InboundMessage):
+        adapter = self.adapters.get(msg.platform)
+        if not adapter: 
+            return
+
+        if self.chatbot.is_overloaded():
+            logger.warning(f"Backend overloaded, answering {msg.platform} user {msg.platform_unique_id} with busy message")
+            await self.send_reply(ReplyCallback(
+                user_id=msg.platform_unique_id,
+                platform=msg.platform,
+                answer=BUSY_MESSAGE,
+                conversation_id=msg.conversation_id
+            ))
+            return
+
         success = await self.chatbot.ask(
             msg.query, 
             msg.conversation_id, 
@@ -244,12 +425,30 @@ class MessageOrchestrator:
             except Exception: 
                 pass
 
-    def _save_email_metadata(self, msg: IncomingMessage):
+    async def _touch_activity(self, platform: str, conversation_id: Optional[str], user_id: str):
+        # Only chat sessions are timed out, so email activity is not tracked.
+        if conversation_id and platform in ("whatsapp", "instagram"):
+            await self.repo_conv.touch_activity([conversation_id])
+            if self.session_timer:
+                self.session_timer.arm(conversation_id, platform, user_id)
+
+    @staticmethod
+    def dispatch_key(msg: InboundMessage) -> str:
+        return f"{msg.platform}:{msg.platform_unique_id}"
+
+    async def handle_event(self, msg: InboundMessage):
+        if msg.is_feedback:
+            logger.info(f"Feedback Event Received ({msg.platform}): {msg.feedback_payload}")
+            await self.handle_feedback(msg)
+        else:
+            await self.process_message(msg)
+
+    async def _save_email_metadata(self, msg: InboundMessage):
         if msg.platform != "email" or not msg.conversation_id or not msg.metadata:
             return
             
         if settings.EMAIL_PROVIDER == "azure_oauth2":
-            self.repo_msg.save_email_metadata(
+            await self.repo_msg.save_email_metadata(
                 conversation_id=msg.conversation_id,
                 subject=msg.metadata.get("subject", ""),
                 in_reply_to=msg.metadata.get("graph_message_id", ""), 
@@ -257,7 +456,7 @@ class MessageOrchestrator:
                 thread_key=msg.metadata.get("conversation_id", "") 
             )
         else:
-            self.repo_msg.save_email_metadata(
+            await self.repo_msg.save_email_metadata(
                 conversation_id=msg.conversation_id,
                 subject=msg.metadata.get("subject", ""),
                 in_reply_to=msg.metadata.get("message_id", ""),
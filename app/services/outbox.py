@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from app.repositories.outbox import OutboxRepository
+
+logger = logging.getLogger("service.outbox")
+
+class OutboxWorker:
+    # Drains bkpm.backend_outbox in batches. Every replica runs one; FOR UPDATE SKIP LOCKED
+    # hands each row to a single claimer, and an expired lease makes rows from a crashed
+    # replica claimable again, which gives at-least-once delivery.
+
+    def __init__(
+        self,
+        repo: OutboxRepository,
+        chatbot,
+        batch_size: int,
+        poll_interval: float,
+        lease_seconds: float,
+        max_attempts: int,
+        max_backoff_seconds: float
+    ):
+        self.repo = repo
+        self.chatbot = chatbot
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_backoff_seconds = max_backoff_seconds
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+        self.held = 0
+
+    async def enqueue(self, payload: Dict[str, Any], resolve_active: bool) -> str:
+        conversation_id = await self.repo.enqueue_ask(payload, resolve_active)
+        self.enqueued += 1
+        self._wake.set()
+        return conversation_id
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="outbox-worker")
+            logger.info("Outbox Worker Started...")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                rows = await self.repo.claim_batch(self.batch_size, self.lease_seconds)
+                if rows:
+                    await self._deliver_batch(rows)
+                    if len(rows) == self.batch_size:
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox Worker Error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver_batch(self, rows):
+        # One user's asks go out in id order and the users run in parallel. After a failure the
+        # user's later rows are released untried; claim_batch holds them back behind it.
+        groups: Dict[Tuple[str, str], List[Tuple[int, Dict[str, Any], int]]] = {}
+        for row in sorted(rows, key=lambda row: row[0]):
+            groups.setdefault((row[1].get("platform"), row[1].get("platform_unique_id")), []).append(row)
+        outcomes = await asyncio.gather(*(self._deliver_group(group) for group in groups.values()))
+
+        sent = [row_id for group_sent, _, _ in outcomes for row_id in group_sent]
+        failed = [row_id for _, group_failed, _ in outcomes for row_id in group_failed]
+        held = [row_id for _, _, group_held in outcomes for row_id in group_held]
+
+        await self.repo.mark_sent(sent)
+        self.delivered += len(sent)
+
+        if held:
+            await self.repo.release(held)
+            self.held += len(held)
+
+        if failed:
+            dead = await self.repo.mark_failed(
+                failed, self.max_attempts, self.max_backoff_seconds, "backend push failed"
+            )
+            self.dead += dead
+            self.retried += len(failed) - dead
+            if dead:
+                logger.error(f"{dead} outbox rows moved to dead-letter after {self.max_attempts} attempts")
+
+    async def _deliver_group(self, rows) -> Tuple[List[int], List[int], List[int]]:
+        sent = []
+        for index, (row_id, payload, _) in enumerate(rows):
+            if not await self.chatbot.deliver(payload):
+                return sent, [row_id], [row[0] for row in rows[index + 1:]]
+            sent.append(row_id)
+        return sent, [], []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "held": self.held,
+            "dead": self.dead
+        }
@@ -1,79 +1,106 @@
-from typing import Dict, Any, Optional, Tuple
-from app.schemas.models import IncomingMessage
+import json
+from typing import Dict, Any, Optional, List
+from app.schemas.models import InboundMessage
 from app.core.config import settings
 
-def parse_whatsapp_payload(data: Dict[str, Any]) -> Optional[IncomingMessage]:
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+def decode_body(body: bytes) -> Dict[str, Any]:
+    return _loads(body)
+
+def _parse_whatsapp_message(message: Dict[str, Any]) -> Optional[InboundMessage]:
     try:
-        entry = data.get("entry", [])[0]
-        changes = entry.get("changes", [])[0]
-        value = changes.get("value", {})
-        
-        if "messages" not in value:
-            return None
-            
-        message = value["messages"][0]
         sender_id = message.get("from")
-        msg_id = message.get("id") 
+        msg_id = message.get("id")
 
         if str(sender_id) == str(settings.WHATSAPP_PHONE_NUMBER_ID):
             return None
 
         msg_type = message.get("type")
-        
+
         if msg_type == "text":
-            return IncomingMessage(
+            return InboundMessage(
                 platform_unique_id=sender_id,
                 query=message["text"]["body"],
                 platform="whatsapp",
-                metadata={"phone": sender_id, "message_id": msg_id}
+                message_id=msg_id
             )
-            
+
         elif msg_type == "interactive":
             interactive = message.get("interactive", {})
             if interactive.get("type") == "button_reply":
                 btn_id = interactive["button_reply"]["id"]
-                return IncomingMessage(
+                return InboundMessage(
                     platform_unique_id=sender_id,
                     query=f"FEEDBACK_EVENT:{btn_id}",
                     platform="whatsapp",
-                    metadata={"is_feedback": True, "payload": btn_id, "message_id": msg_id}
+                    message_id=msg_id,
+                    feedback_payload=btn_id
                 )
-                
-    except (IndexError, KeyError, AttributeError):
+
+    except (KeyError, AttributeError, TypeError):
         pass
     return None
 
-def parse_instagram_payload(data: Dict[str, Any]) -> Optional[IncomingMessage]:
+def parse_whatsapp_payload(data: Dict[str, Any]) -> List[InboundMessage]:
+    results = []
+    try:
+        for entry in data.get("entry", []):
+            for changes in entry.get("changes", []):
+                value = changes.get("value", {})
+                for message in value.get("messages", []):
+                    msg = _parse_whatsapp_message(message)
+                    if msg:
+                        results.append(msg)
+    except AttributeError:
+        pass
+    return results
+
+def _parse_instagram_event(messaging: Dict[str, Any]) -> Optional[InboundMessage]:
     try:
-        entry = data.get("entry", [])[0]
-        messaging = entry.get("messaging", [])[0]
-        
         sender_id = messaging.get("sender", {}).get("id")
-        
+
         if str(sender_id) == str(settings.INSTAGRAM_CHATBOT_ID):
             return None
 
         message = messaging.get("message", {})
-        msg_id = message.get("mid") 
-        
+        msg_id = message.get("mid")
+
         if "quick_reply" in message:
             payload = message["quick_reply"].get("payload")
-            return IncomingMessage(
+            return InboundMessage(
                 platform_unique_id=sender_id,
                 query=f"FEEDBACK_EVENT:{payload}",
                 platform="instagram",
-                metadata={"is_feedback": True, "payload": payload, "message_id": msg_id}
+                message_id=msg_id,
+                feedback_payload=payload or ""
             )
 
         if "text" in message:
             if message.get("is_echo"): return None
-            return IncomingMessage(
+            return InboundMessage(
                 platform_unique_id=sender_id,
                 query=message["text"],
                 platform="instagram",
-                metadata={"message_id": msg_id}
+                message_id=msg_id
             )
-            
-    except (IndexError, KeyError, AttributeError):
+
+    except (KeyError, AttributeError, TypeError):
+        pass
+    return None
+
+def parse_instagram_payload(data: Dict[str, Any]) -> List[InboundMessage]:
+    results = []
+    try:
+        for entry in data.get("entry", []):
+            for messaging in entry.get("messaging", []):
+                msg = _parse_instagram_event(messaging)
+                if msg:
+                    results.append(msg)
+    except AttributeError:
         pass
-    return None
\ No newline at end of file
+    return results
@@ -0,0 +1,57 @@
+import re
+from collections import Counter
+from typing import Dict, Optional
+
+# Classifies raw webhook bodies before any JSON decoding. Meta sends compact JSON,
+# and quotes inside string values are escaped, so a quoted key followed by a colon only
+# matches real keys (every WhatsApp change also carries the value "field":"messages").
+# A None result means "might contain a user message, parse it".
+
+_WA_MESSAGES = re.compile(rb'"messages"\s*:')
+_WA_STATUSES = re.compile(rb'"statuses"\s*:')
+
+_IG_MESSAGE = re.compile(rb'"message"\s*:')
+_IG_ECHO = re.compile(rb'"is_echo"\s*:\s*true')
+_IG_READ = b'"read"'
+_IG_DELIVERY = b'"delivery"'
+_IG_REACTION = b'"reaction"'
+
+_dropped: Counter = Counter()
+_passed: Counter = Counter()
+
+def classify_whatsapp_body(body: bytes) -> Optional[str]:
+    if _WA_MESSAGES.search(body):
+        return None
+    if _WA_STATUSES.search(body):
+        return "whatsapp_status"
+    return "whatsapp_other"
+
+def classify_instagram_body(body: bytes) -> Optional[str]:
+    message_count = len(_IG_MESSAGE.findall(body))
+    if message_count:
+        if message_count == len(_IG_ECHO.findall(body)):
+            return "instagram_echo"
+        return None
+    if _IG_READ in body:
+        return "instagram_read"
+    if _IG_DELIVERY in body:
+        return "instagram_delivery"
+    if _IG_REACTION in body:
+        return "instagram_reaction"
+    return "instagram_other"
+
+def should_drop(platform: str, body: bytes) -> bool:
+    if platform == "whatsapp":
+        reason = classify_whatsapp_body(body)
+    else:
+        reason = classify_instagram_body(body)
+
+    if reason:
+        _dropped[reason] += 1
+        return True
+
+    _passed[platform] += 1
+    return False
+
+def get_stats() -> Dict[str, Dict[str, int]]:
+    return {"dropped": dict(_dropped), "passed": dict(_passed)}
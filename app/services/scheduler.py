@@ -1,31 +1,290 @@
 import asyncio
+import time
 import logging
-from app.api.dependencies import get_orchestrator
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from app.api.dependencies import get_orchestrator, get_session_timer
+from app.core.config import settings
 from app.repositories.conversation import ConversationRepository
+from app.repositories.message import MessageRepository
+from app.services.limiter import RateLimiter
+from app.services.session_timer import SessionTimer
 
 logger = logging.getLogger("service.scheduler")
 
-async def run_scheduler():
-    logger.info("Session Timeout Scheduler Started...")
-    repo_conv = ConversationRepository()    
-    await asyncio.sleep(5)
+# Chat platforms whose sessions time out; each is paged and paced on its own.
+PLATFORMS = ("whatsapp", "instagram")
+
+class SessionTimeoutScheduler:
+    # Pages through each platform's stale sessions with a keyset on (last_activity_at, id) and
+    # times them out concurrently, paced per platform. With a SessionTimer the wheel fires sessions instead,
+    # re-armed every catch_up_interval from activity other workers wrote to the DB.
+
+    def __init__(
+        self,
+        repo_conv: ConversationRepository,
+        repo_msg: MessageRepository,
+        timeout_minutes: int,
+        concurrency: int,
+        page_size: int,
+        rates: Dict[str, float],
+        timer: Optional[SessionTimer] = None,
+        reconcile_interval: float = 600,
+        catch_up_interval: float = 10,
+        retry_delay: float = 30
+    ):
+        self.repo_conv = repo_conv
+        self.repo_msg = repo_msg
+        self.timeout_minutes = timeout_minutes
+        self.concurrency = max(1, concurrency)
+        self.page_size = max(1, page_size)
+        self.limiters = {platform: RateLimiter(rate, burst=max(1, int(rate))) for platform, rate in rates.items()}
+        self.timer = timer
+        self.reconcile_interval = reconcile_interval
+        self.catch_up_interval = catch_up_interval
+        self.retry_delay = retry_delay
+        self._last_scan = 0.0
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._tasks = set()
+        self._inflight_ids = set()
+        self.passes = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.backlog = 0
+        self.lag_seconds = 0.0
+        self.last_pass_sessions = 0
+        self.last_pass_seconds = 0.0
+        self.kept_alive = 0
+        self.caught_up = 0
+
+    def _overdue(self, last_activity: datetime) -> float:
+        idle = (datetime.now(timezone.utc) - last_activity).total_seconds()
+        return max(0.0, idle - self.timeout_minutes * 60)
+
+    async def run(self):
+        logger.info("Session Timeout Scheduler Started...")
+        next_prune = 0.0
+        next_reconcile = 0.0
+        driver = None
+        if self.timer:
+            self.timer.activate()
+            driver = asyncio.create_task(self._drive_timer(), name="session-timer")
+        await asyncio.sleep(5)
+
+        try:
+            while True:
+                try:
+                    if self.timer and time.monotonic() >= next_reconcile:
+                        await self.reconcile()
+                        next_reconcile = time.monotonic() + self.reconcile_interval
+                    elif self.timer:
+                        await self.catch_up()
+                    else:
+                        await self.run_pass()
+
+                    if time.monotonic() >= next_prune:
+                        next_prune = time.monotonic() + settings.PROCESSED_MESSAGES_PRUNE_INTERVAL_SECONDS
+                        pruned = await self.repo_msg.prune_processed(settings.PROCESSED_MESSAGES_RETENTION_DAYS)
+                        if pruned:
+                            logger.info(f"Pruned {pruned} processed message ids older than {settings.PROCESSED_MESSAGES_RETENTION_DAYS} days.")
+
+                except Exception as e:
+                    logger.error(f"Scheduler Error: {e}")
+
+                await asyncio.sleep(self.catch_up_interval if self.timer else settings.SESSION_TIMEOUT_INTERVAL_SECONDS)
+        finally:
+            if driver:
+                driver.cancel()
+                await asyncio.gather(driver, return_exceptions=True)
+                self.timer.deactivate()
+            for task in list(self._tasks):
+                task.cancel()
+
+    async def reconcile(self) -> int:
+        started = time.monotonic()
+        armed = await self._arm_pages(lambda after: self.repo_conv.get_stale_sessions(minutes=0, limit=self.page_size, after=after))
+        self._last_scan = started
+        self.last_pass_sessions = armed
+        self.passes += 1
+        return armed
+
+    async def catch_up(self) -> int:
+        # Activity written since the previous scan, plus one interval of overlap for touches
+        # that committed late with an earlier timestamp.
+        started = time.monotonic()
+        window = started - self._last_scan + self.catch_up_interval
+        armed = await self._arm_pages(lambda after: self.repo_conv.get_recent_sessions(window, limit=self.page_size, after=after))
+        self._last_scan = started
+        self.caught_up += armed
+        return armed
+
+    async def _arm_pages(self, fetch) -> int:
+        after: Optional[Tuple[datetime, str]] = None
+        armed = 0
+        while True:
+            page = await fetch(after)
+            for conv_id, platform, user_id, last_activity in page:
+                if conv_id not in self._inflight_ids:
+                    self.timer.arm(conv_id, platform, user_id, last_activity.timestamp())
+            armed += len(page)
+            if len(page) < self.page_size:
+                return armed
+            after = (page[-1][3], page[-1][0])
+
+    async def _drive_timer(self):
+        orchestrator = get_orchestrator()
+        while True:
+            await asyncio.sleep(self.timer.wheel.tick)
+            due = self.timer.due()
+            if not due:
+                continue
+            try:
+                await self._fire(orchestrator, due)
+            except Exception as e:
+                logger.error(f"Failed to check {len(due)} due sessions: {e}")
+                for conv_id, platform, user_id in due:
+                    if conv_id not in self._inflight_ids:
+                        self.timer.retry(conv_id, platform, user_id, self.retry_delay)
+
+    async def _fire(self, orchestrator, due):
+        activity = await self.repo_conv.get_open_session_activity([conv_id for conv_id, _, _ in due])
+        lanes: Dict[str, list] = {}
+        for session in due:
+            lanes.setdefault(session[1], []).append(session)
+        await asyncio.gather(*(self._fire_lane(orchestrator, sessions, activity) for sessions in lanes.values()))
+
+    async def _fire_lane(self, orchestrator, due, activity: Dict[str, datetime]):
+        now = time.time()
+        for conv_id, platform, user_id in due:
+            last_activity = activity.get(conv_id)
+            if last_activity is None or conv_id in self._inflight_ids:
+                # Closed or handed to the helpdesk meanwhile, or already being timed out.
+                continue
+            if last_activity.timestamp() + self.timer.timeout > now + self.timer.wheel.tick:
+                # Kept alive by a message another replica handled.
+                self.kept_alive += 1
+                self.timer.arm(conv_id, platform, user_id, last_activity.timestamp())
+                continue
+
+            await self._start(orchestrator, (conv_id, platform, user_id, last_activity))
+
+    async def _start(self, orchestrator, session: Tuple[str, str, str, datetime]) -> asyncio.Task:
+        # The rate token comes first, so a slot is never held by a session waiting on its
+        # platform's pace.
+        limiter = self.limiters.get(session[1])
+        if limiter:
+            await limiter.acquire()
+        await self._slots.acquire()
+        return self._spawn(orchestrator, session)
+
+    def _spawn(self, orchestrator, session: Tuple[str, str, str, datetime]):
+        self.backlog += 1
+        self._inflight_ids.add(session[0])
+        task = asyncio.create_task(self._timeout(orchestrator, session))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run_pass(self) -> int:
+        orchestrator = get_orchestrator()
+        tasks = set()
+        started = time.monotonic()
+        found = 0
 
-    while True:
         try:
-            orchestrator = get_orchestrator()
-            stale_sessions = repo_conv.get_stale_sessions(minutes=15)
-    
-            if stale_sessions:
-                logger.info(f"Found {len(stale_sessions)} stale sessions.")
-
-            for session in stale_sessions:
-                conv_id, platform, user_id = session
-                
-                await orchestrator.timeout_session(conv_id, platform, user_id)
-                
-                await asyncio.sleep(1)
+            found = sum(await asyncio.gather(*(self._page_lane(orchestrator, platform, tasks) for platform in PLATFORMS)))
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            if not found:
+                self.lag_seconds = 0.0
+            self.passes += 1
+            self.last_pass_sessions = found
+            self.last_pass_seconds = round(time.monotonic() - started, 3)
+
+        if found:
+            logger.info(f"Timeout pass handled {found} stale sessions in {self.last_pass_seconds:.1f}s (lag {self.lag_seconds:.0f}s).")
+        return found
+
+    async def _page_lane(self, orchestrator, platform: str, tasks: set) -> int:
+        after: Optional[Tuple[datetime, str]] = None
+        found = 0
+        while True:
+            page = await self.repo_conv.get_stale_sessions(
+                minutes=self.timeout_minutes,
+                limit=self.page_size,
+                after=after,
+                platform=platform
+            )
+            if not page:
+                return found
+
+            found += len(page)
+            for session in page:
+                task = await self._start(orchestrator, session)
+                # Finished tasks drop out, so only the sessions still running are held.
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
 
+            after = (page[-1][3], page[-1][0])
+            if len(page) < self.page_size:
+                return found
+
+    async def _timeout(self, orchestrator, session: Tuple[str, str, str, datetime]):
+        conv_id, platform, user_id, last_activity = session
+        try:
+            # How late this timeout fires compared to when the session became stale.
+            self.lag_seconds = self._overdue(last_activity)
+            await orchestrator.timeout_session(conv_id, platform, user_id)
+            self.timed_out += 1
         except Exception as e:
-            logger.error(f"Scheduler Error: {e}")
-        
-        await asyncio.sleep(60)
\ No newline at end of file
+            self.failed += 1
+            logger.error(f"Failed to time out session {conv_id}: {e}")
+            if self.timer:
+                self.timer.retry(conv_id, platform, user_id, self.retry_delay)
+        finally:
+            self._inflight_ids.discard(conv_id)
+            self.backlog -= 1
+            self._slots.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "timer" if self.timer else "poll",
+            "concurrency": self.concurrency,
+            "inflight": len(self._inflight_ids),
+            "backlog": self.backlog,
+            "lag_seconds": round(self.lag_seconds, 1),
+            "passes": self.passes,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "last_pass_sessions": self.last_pass_sessions,
+            "last_pass_seconds": self.last_pass_seconds,
+            "kept_alive": self.kept_alive,
+            "caught_up": self.caught_up,
+            "timer": self.timer.get_stats() if self.timer else None,
+            "rate_limits": {platform: limiter.get_stats() for platform, limiter in self.limiters.items()}
+        }
+
+_scheduler = SessionTimeoutScheduler(
+    repo_conv=ConversationRepository(),
+    repo_msg=MessageRepository(),
+    timeout_minutes=settings.SESSION_TIMEOUT_MINUTES,
+    concurrency=settings.SESSION_TIMEOUT_CONCURRENCY,
+    page_size=settings.SESSION_TIMEOUT_PAGE_SIZE,
+    rates={
+        "whatsapp": settings.SESSION_TIMEOUT_WHATSAPP_PER_SECOND,
+        "instagram": settings.SESSION_TIMEOUT_INSTAGRAM_PER_SECOND
+    },
+    timer=get_session_timer() if settings.SESSION_TIMER_ENABLED else None,
+    reconcile_interval=settings.SESSION_TIMER_RECONCILE_SECONDS,
+    catch_up_interval=settings.SESSION_TIMER_CATCH_UP_SECONDS,
+    retry_delay=settings.SESSION_TIMER_RETRY_SECONDS
+)
+
+def get_scheduler() -> SessionTimeoutScheduler:
+    return _scheduler
+
+async def run_scheduler():
+    await _scheduler.run()
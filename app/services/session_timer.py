@@ -0,0 +1,142 @@
+import math
+import time
+import logging
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("service.session_timer")
+
+class TimerWheel:
+    # Hierarchical timing wheel. Level 0 has one slot per tick; every level above has slots
+    # as wide as a full turn of the level below (default: seconds, minutes, hours). A timer
+    # sits in the lowest level whose span still covers it and cascades down one level each
+    # time the wheel reaches its slot, so schedule/cancel are O(1) and advancing costs one
+    # slot per tick plus the timers that actually move. Timers beyond the top level's span
+    # are parked in the top level and re-placed each time their slot comes round.
+
+    def __init__(self, tick: float = 1.0, slots: Tuple[int, ...] = (60, 60, 24), now: Optional[float] = None):
+        self.tick = tick
+        self._slots = slots
+        self._resolution = [math.prod(slots[:level]) for level in range(len(slots))]
+        self._levels: List[List[Set[Hashable]]] = [[set() for _ in range(size)] for size in slots]
+        # key -> (due tick, deadline, payload, level, slot)
+        self._timers: Dict[Hashable, Tuple[int, float, Any, int, int]] = {}
+        self._current = int((time.time() if now is None else now) / tick)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        timer = self._timers.get(key)
+        return timer[1] if timer else None
+
+    def schedule(self, key: Hashable, deadline: float, payload: Any = None):
+        self.cancel(key)
+        due = max(math.ceil(deadline / self.tick), self._current + 1)
+        self._place(key, due, deadline, payload)
+
+    def cancel(self, key: Hashable) -> bool:
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        self._levels[timer[3]][timer[4]].discard(key)
+        return True
+
+    def _place(self, key: Hashable, due: int, deadline: float, payload: Any):
+        delta = due - self._current
+        level = 0
+        while level < len(self._slots) - 1 and delta >= self._resolution[level + 1]:
+            level += 1
+        slot = (due // self._resolution[level]) % self._slots[level]
+        self._levels[level][slot].add(key)
+        self._timers[key] = (due, deadline, payload, level, slot)
+
+    def advance(self, now: float) -> List[Tuple[Hashable, Any]]:
+        # Moves the wheel up to `now` and returns (key, payload) for every timer that came due.
+        target = int(now / self.tick)
+        expired = []
+        if not self._timers:
+            self._current = max(self._current, target)
+            return expired
+
+        while self._current < target:
+            self._current += 1
+            for level in range(len(self._slots) - 1, 0, -1):
+                if self._current % self._resolution[level] == 0:
+                    self._cascade(level, (self._current // self._resolution[level]) % self._slots[level])
+
+            bucket = self._levels[0][self._current % self._slots[0]]
+            for key in list(bucket):
+                due, _, payload, _, _ = self._timers[key]
+                if due <= self._current:
+                    bucket.discard(key)
+                    del self._timers[key]
+                    expired.append((key, payload))
+        return expired
+
+    def _cascade(self, level: int, slot: int):
+        keys = self._levels[level][slot]
+        self._levels[level][slot] = set()
+        for key in keys:
+            due, deadline, payload, _, _ = self._timers[key]
+            self._place(key, due, deadline, payload)
+
+
+class SessionTimer:
+    # Per-conversation inactivity deadlines for chat sessions. The orchestrator re-arms a
+    # conversation on every inbound and outbound message; the scheduler rebuilds it from the
+    # DB and drives it once per tick. Arming is a no-op until the scheduler activates it, so
+    # replicas that do not run the scheduler keep nothing in memory.
+
+    def __init__(self, timeout_seconds: float, tick: float = 1.0):
+        self.timeout = timeout_seconds
+        self.wheel = TimerWheel(tick=tick)
+        self.active = False
+        self.armed = 0
+        self.fired = 0
+        self.retried = 0
+
+    def activate(self):
+        self.active = True
+
+    def deactivate(self):
+        self.active = False
+        self.wheel = TimerWheel(tick=self.wheel.tick)
+
+    def arm(self, conversation_id: str, platform: str, user_id: str, last_activity: Optional[float] = None):
+        # Deadlines only move forward: a DB rebuild must not pull in a deadline that a
+        # message seen here has already pushed out.
+        if not self.active:
+            return
+        deadline = (time.time() if last_activity is None else last_activity) + self.timeout
+        current = self.wheel.deadline(conversation_id)
+        if current is not None and current >= deadline:
+            return
+        self.wheel.schedule(conversation_id, deadline, (platform, user_id))
+        self.armed += 1
+
+    def retry(self, conversation_id: str, platform: str, user_id: str, delay: float):
+        # A timeout that failed is due again after `delay`, whatever its last activity says.
+        if not self.active:
+            return
+        self.wheel.schedule(conversation_id, time.time() + delay, (platform, user_id))
+        self.retried += 1
+
+    def cancel(self, conversation_id: str):
+        self.wheel.cancel(conversation_id)
+
+    def due(self, now: Optional[float] = None) -> List[Tuple[str, str, str]]:
+        expired = self.wheel.advance(time.time() if now is None else now)
+        self.fired += len(expired)
+        return [(conversation_id, platform, user_id) for conversation_id, (platform, user_id) in expired]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "timers": len(self.wheel),
+            "armed": self.armed,
+            "fired": self.fired,
+            "retried": self.retried
+        }
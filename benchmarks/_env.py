@@ -0,0 +1,21 @@
+"""Placeholder settings so the tests and benchmarks can import app modules without a .env file.
+
+Call use_placeholder_settings() before anything from app is imported; real environment
+variables take precedence.
+"""
+import os
+
+PLACEHOLDER_SETTINGS = {
+    "BACKEND_API_BASE_URL": "http://localhost",
+    "BACKEND_API_KEY": "placeholder",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "bkpm",
+    "DB_USER": "bkpm",
+    "EMAIL_HOST": "localhost",
+}
+
+
+def use_placeholder_settings():
+    for key, value in PLACEHOLDER_SETTINGS.items():
+        os.environ.setdefault(key, value)
@@ -0,0 +1,111 @@
+"""Queries and latency per inbound message for conversation resolution.
+
+before:   get_active_id + is_helpdesk_session + get_active_id (the old inbound path)
+single:   get_conversation_state, one prepared query per message
+pipeline: get_conversation_states, --batch lookups per pipelined round trip
+
+queries/msg counts every statement sent, including the pool's liveness check on
+each connection checkout.
+
+Needs a database with the bkpm schema (DB_* env vars). It seeds --users rows with
+platform 'bench' into bkpm.conversations and deletes them afterwards.
+
+Usage: python -m benchmarks.bench_conversation_state [--users 200] [--rounds 5] [--batch 20]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from benchmarks._env import use_placeholder_settings
+
+use_placeholder_settings()  # before any app import
+
+import psycopg
+from app.repositories.base import Database
+from app.repositories.conversation import ConversationRepository
+
+PLATFORM = "bench"
+queries = 0
+_execute = psycopg.AsyncCursor.execute
+
+
+async def counting_execute(self, *args, **kwargs):
+    global queries
+    queries += 1
+    return await _execute(self, *args, **kwargs)
+
+
+psycopg.AsyncCursor.execute = counting_execute
+
+
+async def seed(users: list):
+    async with Database.get_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.executemany(
+                """
+                INSERT INTO bkpm.conversations (id, platform_unique_id, platform, start_timestamp, is_helpdesk)
+                VALUES (%s, %s, %s, NOW(), %s)
+                """,
+                [(uuid.uuid4(), user, PLATFORM, i % 10 == 0) for i, user in enumerate(users)]
+            )
+        await conn.commit()
+
+
+async def cleanup():
+    async with Database.get_connection() as conn:
+        await conn.execute("DELETE FROM bkpm.conversations WHERE platform = %s", (PLATFORM,))
+        await conn.commit()
+
+
+async def before(repo: ConversationRepository, users: list, batch: int):
+    for user in users:
+        active_id = await repo.get_active_id(user, PLATFORM)
+        if active_id:
+            await repo.is_helpdesk_session(active_id)
+        await repo.get_active_id(user, PLATFORM)
+
+
+async def single(repo: ConversationRepository, users: list, batch: int):
+    for user in users:
+        await repo.get_conversation_state(user, PLATFORM)
+
+
+async def pipeline(repo: ConversationRepository, users: list, batch: int):
+    for start in range(0, len(users), batch):
+        await repo.get_conversation_states([(user, PLATFORM) for user in users[start:start + batch]])
+
+
+async def main():
+    global queries
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=20)
+    args = parser.parse_args()
+
+    await Database.initialize()
+    repo = ConversationRepository()
+    users = [f"bench-{i}" for i in range(args.users)]
+    await cleanup()
+    await seed(users)
+
+    total = args.users * args.rounds
+    print(f"users: {args.users}  rounds: {args.rounds}  batch: {args.batch}")
+    print(f"{'strategy':<10}{'queries/msg':>13}{'us/msg':>10}{'msg/s':>10}")
+    try:
+        for name, run in (("before", before), ("single", single), ("pipeline", pipeline)):
+            await run(repo, users, args.batch)
+            queries = 0
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                await run(repo, users, args.batch)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10}{queries / total:>13.2f}{elapsed / total * 1e6:>10.0f}{total / elapsed:>10.0f}")
+    finally:
+        await cleanup()
+        await Database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""p50/p99 send latency: a fresh AsyncClient per call vs the shared HttpClients pool.
+
+By default it runs against a local keep-alive HTTP server that delays each new
+connection by --handshake-ms, as a stand-in for the TCP+TLS setup to
+graph.facebook.com. Pass --url to measure a real endpoint instead.
+
+Usage: python -m benchmarks.bench_http_clients [--requests 500] [--concurrency 20] [--handshake-ms 40]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks._env import use_placeholder_settings
+
+use_placeholder_settings()  # before any app import
+
+import httpx
+from app.core.http import HttpClients
+
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: 47\r\n"
+    b"Connection: keep-alive\r\n\r\n"
+    b'{"messaging_product":"whatsapp","messages":[]}\n'
+)
+
+
+async def start_local_server(handshake_ms: float, latency_ms: float):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await asyncio.sleep(handshake_ms / 1000)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                await asyncio.sleep(latency_ms / 1000)
+                writer.write(RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}/v24.0/123/messages"
+
+
+async def fresh_client_send(url: str, payload: dict):
+    async with httpx.AsyncClient(timeout=10) as client:
+        await client.post(url, json=payload)
+
+
+async def pooled_send(url: str, payload: dict):
+    await HttpClients.for_url(url).post(url, json=payload, timeout=10)
+
+
+async def measure(send, url: str, total: int, concurrency: int) -> list:
+    payload = {"messaging_product": "whatsapp", "to": "62812", "type": "text", "text": {"body": "halo"}}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await send(url, payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=40.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server, url = await start_local_server(args.handshake_ms, args.latency_ms)
+
+    HttpClients.initialize()
+    print(f"target: {url}  requests: {args.requests}  concurrency: {args.concurrency}")
+    print(f"{'client':<10}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    try:
+        for name, send in (("before", fresh_client_send), ("after", pooled_send)):
+            latencies = await measure(send, url, args.requests, args.concurrency)
+            print(f"{name:<10}{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}{statistics.mean(latencies):>10.1f}")
+    finally:
+        await HttpClients.close()
+        if server:
+            server.close()
+            await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
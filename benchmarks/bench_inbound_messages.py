@@ -0,0 +1,118 @@
+"""Per-message CPU and memory cost of webhook decoding.
+
+Compares the previous path (json.loads + the parsers module as it was before the
+slotted message type, read from git) against the current one (orjson when available
++ slotted InboundMessage).
+
+Usage: python -m benchmarks.bench_inbound_messages [--batch 10] [--rounds 2000] [--baseline REV]
+"""
+import argparse
+import gc
+import json
+import subprocess
+import time
+import tracemalloc
+import types
+
+from benchmarks._env import use_placeholder_settings
+
+use_placeholder_settings()  # before any app import
+
+from app.services.parsers import decode_body, parse_whatsapp_payload
+
+# Last revision whose parsers built pydantic IncomingMessage objects with a metadata dict.
+BASELINE_REV = "0e52eac^"
+
+
+def build_body(batch: int) -> bytes:
+    messages = [
+        {
+            "from": f"62812{i:07d}",
+            "id": f"wamid.HBgMNjI4MTIzNDU2Nzg5FQIAEhggQ0E{i:08d}",
+            "timestamp": "1736755200",
+            "type": "text",
+            "text": {"body": "Halo, saya mau tanya soal perizinan berusaha untuk PMA di sektor manufaktur."},
+        }
+        for i in range(batch)
+    ]
+    payload = {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "1234567890",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"display_phone_number": "628000000", "phone_number_id": "1098765"},
+                    "contacts": [{"profile": {"name": "Pengguna"}, "wa_id": m["from"]} for m in messages],
+                    "messages": messages,
+                },
+            }],
+        }],
+    }
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def load_baseline_parsers(rev: str) -> types.ModuleType:
+    source = subprocess.run(
+        ["git", "show", f"{rev}:app/services/parsers.py"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    module = types.ModuleType("baseline_parsers")
+    exec(compile(source, f"{rev}:app/services/parsers.py", "exec"), module.__dict__)
+    return module
+
+
+def make_legacy_path(rev: str):
+    parse = load_baseline_parsers(rev).parse_whatsapp_payload
+
+    def legacy_path(body: bytes) -> list:
+        # The webhook routes decoded with Request.json(), which is json.loads.
+        return parse(json.loads(body))
+    return legacy_path
+
+
+def current_path(body: bytes) -> list:
+    return parse_whatsapp_payload(decode_body(body))
+
+
+def cpu_per_message(fn, body: bytes, batch: int, rounds: int) -> float:
+    fn(body)
+    gc.collect()
+    start = time.process_time()
+    for _ in range(rounds):
+        fn(body)
+    return (time.process_time() - start) / (rounds * batch) * 1e6
+
+
+def bytes_per_message(fn, body: bytes, batch: int, rounds: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    retained = [fn(body) for _ in range(rounds)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return current / (rounds * batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--baseline", default=BASELINE_REV, help="git revision of the previous parsers")
+    args = parser.parse_args()
+
+    legacy_path = make_legacy_path(args.baseline)
+    body = build_body(args.batch)
+    assert len(legacy_path(body)) == len(current_path(body)) == args.batch
+
+    print(f"payload: {len(body)} bytes, {args.batch} messages, {args.rounds} rounds")
+    print(f"{'path':<10}{'cpu us/msg':>14}{'retained B/msg':>18}")
+    for name, fn in (("before", legacy_path), ("after", current_path)):
+        cpu = cpu_per_message(fn, body, args.batch, args.rounds)
+        mem = bytes_per_message(fn, body, args.batch, min(args.rounds, 500))
+        print(f"{name:<10}{cpu:>14.2f}{mem:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
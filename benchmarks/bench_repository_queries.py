@@ -0,0 +1,227 @@
+"""Seeds bkpm with synthetic data, then times every repository query and checks its plan.
+
+Each repository method is called --calls times against random seeded keys (p50/p99),
+and the SQL it sent is captured and run once more under EXPLAIN (ANALYZE, BUFFERS)
+inside a rolled-back transaction. Plans that contain a Seq Scan are flagged; with
+--strict the script exits non-zero on any of them.
+
+Point DB_* at a scratch database with migrations applied
+(python -m app.repositories.migrations). Seeded rows are prefixed with 'seed-' and
+deleted afterwards; the script refuses to run if bkpm.conversations holds other rows
+unless --force is given.
+
+Usage: python -m benchmarks.bench_repository_queries [--conversations 200000] [--calls 200] [--strict]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+
+from benchmarks._env import use_placeholder_settings
+
+use_placeholder_settings()  # before any app import
+
+import orjson
+import psycopg
+from app.repositories.base import Database
+from app.repositories.conversation import ConversationRepository
+from app.repositories.message import MessageRepository
+from app.repositories.outbox import OutboxRepository
+
+captured = []
+_execute = psycopg.AsyncCursor.execute
+
+
+async def capturing_execute(self, query, params=None, **kwargs):
+    if query:
+        captured.append((query, params))
+    return await _execute(self, query, params, **kwargs)
+
+
+psycopg.AsyncCursor.execute = capturing_execute
+
+
+SEED_SQL = [
+    # ~4 sessions per user; the newest 5% of sessions are still open, 2% are helpdesk.
+    """
+    INSERT INTO bkpm.conversations (id, platform_unique_id, platform, start_timestamp, end_timestamp, is_helpdesk, last_activity_at)
+    SELECT gen_random_uuid(),
+           'seed-' || (g %% (%(n)s / 4)),
+           (ARRAY['whatsapp', 'instagram', 'email'])[1 + g %% 3],
+           NOW() - ((%(n)s - g) * INTERVAL '10 seconds'),
+           CASE WHEN g > %(n)s * 0.95 THEN NULL ELSE NOW() - ((%(n)s - g) * INTERVAL '10 seconds') + INTERVAL '10 minutes' END,
+           g %% 50 = 0,
+           NOW() - ((%(n)s - g) * INTERVAL '10 seconds')
+    FROM generate_series(1, %(n)s) g
+    """,
+    """
+    INSERT INTO bkpm.chat_history (session_id, question, answer, created_at)
+    SELECT c.id, 'pertanyaan', 'jawaban', c.start_timestamp + k * INTERVAL '1 minute'
+    FROM bkpm.conversations c, generate_series(1, %(history)s) k
+    WHERE c.platform_unique_id LIKE 'seed-%%'
+    """,
+    """
+    INSERT INTO bkpm.email_metadata (conversation_id, subject, in_reply_to, "references", thread_key)
+    SELECT c.id, 'Re: seed', '<seed-' || c.id || '>', '', 'seed-thread-' || c.id
+    FROM bkpm.conversations c
+    WHERE c.platform_unique_id LIKE 'seed-%%' AND c.platform = 'email'
+    """,
+    """
+    INSERT INTO bkpm.processed_messages (message_id, platform)
+    SELECT 'seed-msg-' || g, 'whatsapp' FROM generate_series(1, %(processed)s) g
+    """,
+    """
+    INSERT INTO bkpm.backend_outbox (conversation_id, platform, platform_unique_id, payload, status)
+    SELECT gen_random_uuid()::text, 'whatsapp', 'seed-' || g, '{"query": "seed"}'::jsonb,
+           CASE WHEN g %% 10 = 0 THEN 'pending' ELSE 'dead' END
+    FROM generate_series(1, %(outbox)s) g
+    """,
+]
+
+CLEANUP_SQL = [
+    "DELETE FROM bkpm.chat_history h USING bkpm.conversations c WHERE h.session_id = c.id AND c.platform_unique_id LIKE 'seed-%'",
+    "DELETE FROM bkpm.email_metadata WHERE thread_key LIKE 'seed-%'",
+    "DELETE FROM bkpm.conversations WHERE platform_unique_id LIKE 'seed-%'",
+    "DELETE FROM bkpm.processed_messages WHERE message_id LIKE 'seed-%'",
+    "DELETE FROM bkpm.backend_outbox WHERE platform_unique_id LIKE 'seed-%'",
+]
+
+
+async def run_sql(statements, params=None, autocommit=False):
+    async with await psycopg.AsyncConnection.connect(Database.conninfo(), autocommit=autocommit) as conn:
+        for statement in statements:
+            await conn.execute(statement, params)
+        if not autocommit:
+            await conn.commit()
+
+
+async def sample_keys(limit: int = 1000):
+    async with Database.get_connection() as conn:
+        users = await (await conn.execute(
+            "SELECT platform_unique_id, platform FROM bkpm.conversations WHERE platform_unique_id LIKE 'seed-%%' ORDER BY random() LIMIT %s", (limit,)
+        )).fetchall()
+        conversations = await (await conn.execute(
+            "SELECT id::text FROM bkpm.conversations WHERE platform_unique_id LIKE 'seed-%%' ORDER BY random() LIMIT %s", (limit,)
+        )).fetchall()
+        threads = await (await conn.execute(
+            "SELECT thread_key, conversation_id::text FROM bkpm.email_metadata WHERE thread_key LIKE 'seed-%%' ORDER BY random() LIMIT %s", (limit,)
+        )).fetchall()
+    return users, [row[0] for row in conversations], threads
+
+
+def build_cases(users, conversation_ids, threads):
+    conv, msg, outbox = ConversationRepository(), MessageRepository(), OutboxRepository()
+    user = lambda: random.choice(users)
+    conversation = lambda: random.choice(conversation_ids)
+    thread = lambda: random.choice(threads)
+    new_id = lambda: f"seed-new-{uuid.uuid4()}"
+    payload = lambda: {"query": "seed", "platform": "whatsapp", "platform_unique_id": user()[0], "conversation_id": str(uuid.uuid4())}
+
+    return [
+        ("conv.get_conversation_state", lambda: conv.get_conversation_state(*user())),
+        ("conv.get_conversation_states", lambda: conv.get_conversation_states([user() for _ in range(20)])),
+        ("conv.get_active_id", lambda: conv.get_active_id(*user())),
+        ("conv.get_latest_id", lambda: conv.get_latest_id(*user())),
+        ("conv.is_helpdesk_session", lambda: conv.is_helpdesk_session(conversation())),
+        ("conv.get_stale_sessions", lambda: conv.get_stale_sessions(15, platform=random.choice(("whatsapp", "instagram")))),
+        ("conv.get_recent_sessions", lambda: conv.get_recent_sessions(20)),
+        ("conv.touch_activity", lambda: conv.touch_activity([conversation() for _ in range(10)])),
+        ("conv.close_session", lambda: conv.close_session(conversation())),
+        ("msg.claim_message_ids", lambda: msg.claim_message_ids("whatsapp", [new_id() for _ in range(10)])),
+        ("msg.is_processed", lambda: msg.is_processed(f"seed-msg-{random.randint(1, 1000)}", "whatsapp")),
+        ("msg.get_conversation_by_thread", lambda: msg.get_conversation_by_thread(thread()[0])),
+        ("msg.get_email_metadata", lambda: msg.get_email_metadata(thread()[1])),
+        ("msg.save_email_metadata", lambda: (lambda t: msg.save_email_metadata(t[1], "Re: seed", "", "", t[0]))(thread())),
+        ("msg.get_latest_answer_id", lambda: msg.get_latest_answer_id(conversation())),
+        ("outbox.enqueue_ask", lambda: outbox.enqueue_ask(payload())),
+        ("outbox.claim_batch", lambda: outbox.claim_batch(50, 60)),
+    ]
+
+
+def plan_nodes(node, out):
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" {node['Index Name']}"
+    elif "Relation Name" in node:
+        label += f" {node['Relation Name']}"
+    out.append(label)
+    for child in node.get("Plans", []):
+        plan_nodes(child, out)
+    return out
+
+
+async def explain(query, params):
+    async with await psycopg.AsyncConnection.connect(Database.conninfo()) as conn:
+        try:
+            cursor = await conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+            result = (await cursor.fetchone())[0]
+        finally:
+            await conn.rollback()
+    plan = (orjson.loads(result) if isinstance(result, (str, bytes)) else result)[0]
+    return plan_nodes(plan["Plan"], []), plan["Execution Time"]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=200_000)
+    parser.add_argument("--history", type=int, default=5, help="chat_history rows per conversation")
+    parser.add_argument("--processed", type=int, default=500_000)
+    parser.add_argument("--outbox", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--strict", action="store_true")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    await Database.initialize()
+    async with Database.get_connection() as conn:
+        foreign = (await (await conn.execute(
+            "SELECT count(*) FROM bkpm.conversations WHERE platform_unique_id NOT LIKE 'seed-%'"
+        )).fetchone())[0]
+    if foreign and not args.force:
+        print(f"bkpm.conversations has {foreign} non-seed rows; use a scratch database or pass --force")
+        await Database.close()
+        sys.exit(2)
+
+    await run_sql(CLEANUP_SQL)
+    start = time.perf_counter()
+    await run_sql(SEED_SQL, {"n": args.conversations, "history": args.history, "processed": args.processed, "outbox": args.outbox})
+    await run_sql(["VACUUM ANALYZE bkpm.conversations", "VACUUM ANALYZE bkpm.chat_history", "VACUUM ANALYZE bkpm.email_metadata",
+                   "VACUUM ANALYZE bkpm.processed_messages", "VACUUM ANALYZE bkpm.backend_outbox"], autocommit=True)
+    print(f"seeded {args.conversations} conversations, {args.conversations * args.history} history rows, "
+          f"{args.processed} processed ids, {args.outbox} outbox rows in {time.perf_counter() - start:.1f}s")
+
+    seq_scans = 0
+    try:
+        cases = build_cases(*await sample_keys())
+        print(f"{'method':<32}{'p50 ms':>9}{'p99 ms':>9}{'plan ms':>9}  plan")
+        for name, call in cases:
+            latencies = []
+            for _ in range(args.calls):
+                captured.clear()
+                started = time.perf_counter()
+                await call()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            query, params = captured[-1]
+            nodes, plan_ms = await explain(query, params)
+            flagged = any(node.startswith("Seq Scan") for node in nodes)
+            seq_scans += flagged
+            summary = " > ".join(dict.fromkeys(nodes))
+            print(f"{name:<32}{percentile(latencies, 50):>9.2f}{percentile(latencies, 99):>9.2f}{plan_ms:>9.2f}  {'SEQ SCAN ' if flagged else ''}{summary}")
+    finally:
+        await run_sql(CLEANUP_SQL)
+        await Database.close()
+
+    if args.strict and seq_scans:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
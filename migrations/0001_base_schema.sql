@@ -0,0 +1,36 @@
+-- Tables shared with the backend. Everything is IF NOT EXISTS so this is a no-op on
+-- databases where the backend already created them. Their indexes are built without
+-- blocking writes in 0006_concurrent_indexes.sql.
+CREATE SCHEMA IF NOT EXISTS bkpm;
+
+CREATE TABLE IF NOT EXISTS bkpm.conversations (
+    id UUID PRIMARY KEY,
+    platform_unique_id TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    start_timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    end_timestamp TIMESTAMPTZ,
+    is_helpdesk BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS bkpm.chat_history (
+    id BIGSERIAL PRIMARY KEY,
+    session_id UUID NOT NULL,
+    question TEXT,
+    answer TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS bkpm.email_metadata (
+    conversation_id UUID PRIMARY KEY,
+    subject TEXT,
+    in_reply_to TEXT,
+    "references" TEXT,
+    thread_key TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS bkpm.processed_messages (
+    message_id TEXT PRIMARY KEY,
+    platform TEXT NOT NULL
+);
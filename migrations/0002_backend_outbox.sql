@@ -0,0 +1,23 @@
+-- Durable queue of pending pushes to the backend /ask endpoint.
+-- Rows are deleted once delivered; rows that exhaust their retries stay as status 'dead'.
+CREATE TABLE IF NOT EXISTS bkpm.backend_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    platform_unique_id TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS backend_outbox_pending_idx
+    ON bkpm.backend_outbox (available_at, id)
+    WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS backend_outbox_inflight_idx
+    ON bkpm.backend_outbox (locked_until)
+    WHERE status = 'inflight';
@@ -0,0 +1,22 @@
+-- Publishes "<platform>:<platform_unique_id>" on channel bkpm_conversations whenever a
+-- session is opened, closed or escalated, so app replicas can drop cached conversation state.
+CREATE OR REPLACE FUNCTION bkpm.notify_conversation_change() RETURNS trigger AS $$
+DECLARE
+    changed RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    PERFORM pg_notify('bkpm_conversations', changed.platform || ':' || changed.platform_unique_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS conversations_notify_change ON bkpm.conversations;
+
+CREATE TRIGGER conversations_notify_change
+    AFTER INSERT OR DELETE OR UPDATE OF end_timestamp, is_helpdesk, platform, platform_unique_id
+    ON bkpm.conversations
+    FOR EACH ROW EXECUTE FUNCTION bkpm.notify_conversation_change();
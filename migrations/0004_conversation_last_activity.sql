@@ -0,0 +1,11 @@
+-- Last inbound or outbound message per session, maintained by the app, so the session
+-- timeout scan no longer aggregates bkpm.chat_history for every open conversation.
+ALTER TABLE bkpm.conversations
+    ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+UPDATE bkpm.conversations c
+SET last_activity_at = COALESCE(
+    (SELECT MAX(h.created_at) FROM bkpm.chat_history h WHERE h.session_id = c.id),
+    c.start_timestamp
+)
+WHERE c.end_timestamp IS NULL;
@@ -0,0 +1,4 @@
+-- Dedup ids only need to outlive the sender's retry window; the prune job deletes rows older
+-- than PROCESSED_MESSAGES_RETENTION_DAYS, which keeps the primary key index bounded.
+ALTER TABLE bkpm.processed_messages
+    ADD COLUMN IF NOT EXISTS processed_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
@@ -0,0 +1,31 @@
+-- migrate:no-transaction
+-- The backend keeps writing to these tables while a replica starts, so the indexes are
+-- built CONCURRENTLY, one autocommitted statement at a time. A build that fails leaves an
+-- INVALID index behind; drop it (DROP INDEX CONCURRENTLY) before the file is retried.
+
+-- Latest session per user (get_conversation_state, get_active_id, get_latest_id, outbox
+-- rebinding). INCLUDE makes the state lookup an index-only scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS conversations_user_latest_idx
+    ON bkpm.conversations (platform_unique_id, platform, start_timestamp DESC)
+    INCLUDE (id, is_helpdesk, end_timestamp);
+
+-- Latest answer per session (get_latest_answer_id).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_history_session_created_idx
+    ON bkpm.chat_history (session_id, created_at DESC);
+
+-- Email thread lookup (get_conversation_by_thread); most rows have a thread key.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS email_metadata_thread_key_idx
+    ON bkpm.email_metadata (thread_key)
+    INCLUDE (conversation_id)
+    WHERE thread_key IS NOT NULL;
+
+-- Covers every column the stale scan reads, so it is an index-only range scan over open,
+-- non-helpdesk sessions ordered by inactivity.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS conversations_open_activity_idx
+    ON bkpm.conversations (last_activity_at)
+    INCLUDE (id, platform, platform_unique_id, start_timestamp)
+    WHERE end_timestamp IS NULL AND is_helpdesk = FALSE;
+
+-- Retention prune (prune_processed).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS processed_messages_processed_at_idx
+    ON bkpm.processed_messages (processed_at);
@@ -0,0 +1,5 @@
+-- migrate:no-transaction
+-- claim_batch looks up earlier unsent asks of the same user to keep them in order.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS backend_outbox_user_idx
+    ON bkpm.backend_outbox (platform, platform_unique_id, id)
+    WHERE status IN ('pending', 'inflight');
@@ -0,0 +1,3 @@
+from benchmarks._env import use_placeholder_settings
+
+use_placeholder_settings()
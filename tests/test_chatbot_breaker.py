@@ -0,0 +1,35 @@
+import asyncio
+from app.services.breaker import CircuitBreaker
+from app.services.chatbot import ChatbotClient
+from app.services.limiter import AdaptiveLimiter
+
+def _half_open_client(max_queue: int) -> ChatbotClient:
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1, latency_target=1.0, max_queue=max_queue)
+    breaker = CircuitBreaker(name="backend", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return ChatbotClient(limiter=limiter, breaker=breaker)
+
+def test_capacity_rejection_returns_half_open_probe():
+    client = _half_open_client(max_queue=0)
+
+    async def scenario():
+        await client.limiter.acquire()
+        assert not client.is_overloaded()
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+        assert await client.ask("halo", "conv-1", "whatsapp", "6281234567890") is False
+
+    asyncio.run(scenario())
+    # The rejected push never reached the backend, so the next message may still probe it.
+    assert not client.is_overloaded()
+    assert client.is_overloaded()
+
+def test_dropped_request_returns_half_open_probe():
+    client = _half_open_client(max_queue=0)
+
+    async def scenario():
+        await client.limiter.acquire()
+        assert client.breaker.allow()
+        assert await client.deliver({"query": "halo"}) is False
+
+    asyncio.run(scenario())
+    assert client.breaker.allow()
@@ -0,0 +1,45 @@
+import asyncio
+from app.schemas.models import InboundMessage
+from app.services.coalescer import MessageCoalescer
+from app.services.dispatcher import MessageDispatcher
+
+def _message(query: str) -> InboundMessage:
+    return InboundMessage(platform="whatsapp", platform_unique_id="6281234567890", query=query, message_id=query)
+
+def test_timer_flush_runs_on_the_user_partition():
+    async def scenario():
+        dispatcher = MessageDispatcher(workers=1, queue_size=10)
+        coalescer = MessageCoalescer(window=0.05, max_wait=1.0, max_messages=10, max_chars=1000, dispatcher=dispatcher)
+        await dispatcher.start()
+        order = []
+
+        async def flush(msg):
+            order.append(f"flush:{msg.query}")
+
+        async def later_event():
+            await asyncio.sleep(0.2)
+            order.append("later")
+
+        await coalescer.submit(_message("halo"), flush)
+        await dispatcher.submit("whatsapp:6281234567890", later_event)
+        await asyncio.sleep(0.4)
+        await dispatcher.stop()
+        await coalescer.close()
+        return order
+
+    assert asyncio.run(scenario()) == ["later", "flush:halo"]
+
+def test_timer_flush_without_dispatcher_still_delivers():
+    async def scenario():
+        coalescer = MessageCoalescer(window=0.02, max_wait=1.0, max_messages=10, max_chars=1000)
+        flushed = []
+
+        async def flush(msg):
+            flushed.append(msg.query)
+
+        await coalescer.submit(_message("a"), flush)
+        await coalescer.submit(_message("b"), flush)
+        await asyncio.sleep(0.1)
+        return flushed
+
+    assert asyncio.run(scenario()) == ["a\nb"]
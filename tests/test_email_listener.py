@@ -0,0 +1,68 @@
+import concurrent.futures
+import pytest
+from app.adapters.email import listener
+
+class _Dispatcher:
+    # Futures that never complete, as with a full partition or a stopped main loop.
+    def __init__(self):
+        self.futures = []
+        self.released = []
+
+    def _pending(self):
+        future = concurrent.futures.Future()
+        self.futures.append(future)
+        return future
+
+    def submit_threadsafe(self, key, func, *args, timeout=None):
+        return self._pending()
+
+    def call_threadsafe(self, func, *args):
+        if getattr(func, "__name__", "") == "release":
+            self.released.append(args)
+            future = concurrent.futures.Future()
+            future.set_result(None)
+            return future
+        return self._pending()
+
+class _Orchestrator:
+    @staticmethod
+    def dispatch_key(msg):
+        return f"{msg.platform}:{msg.platform_unique_id}"
+
+    async def process_message(self, msg):
+        pass
+
+def _stuck_loop(monkeypatch):
+    dispatcher = _Dispatcher()
+    monkeypatch.setattr(listener.settings, "DISPATCH_EMAIL_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(listener, "get_dispatcher", lambda: dispatcher)
+    monkeypatch.setattr(listener, "get_orchestrator", lambda: _Orchestrator())
+    return dispatcher
+
+def test_stuck_enqueue_times_out(monkeypatch):
+    dispatcher = _stuck_loop(monkeypatch)
+    assert listener.process_single_email("warga@example.com", "Halo, saya mau tanya", {"message_id": "<1@example.com>"}) is False
+    assert dispatcher.futures[0].cancelled()
+
+def test_unqueued_graph_email_stays_unread_and_unclaimed(monkeypatch):
+    dispatcher = _stuck_loop(monkeypatch)
+    marked = []
+    monkeypatch.setattr(listener, "_mark_graph_read", lambda user_id, message_id, token: marked.append(message_id))
+    msg = {
+        "id": "AAMkAGI2",
+        "conversationId": "AAQkAGI2",
+        "subject": "Pertanyaan",
+        "from": {"emailAddress": {"name": "Warga", "address": "warga@example.com"}},
+        "body": {"contentType": "Text", "content": "Halo, saya mau tanya soal izin usaha"}
+    }
+
+    listener._process_graph_message("inbox@example.com", msg, "token", {"AAMkAGI2"})
+
+    assert marked == []
+    assert dispatcher.released == [("email", ["AAMkAGI2"])]
+
+def test_stuck_claim_is_released(monkeypatch):
+    dispatcher = _stuck_loop(monkeypatch)
+    with pytest.raises(concurrent.futures.TimeoutError):
+        listener._claim_new(["<1@example.com>", "<2@example.com>"])
+    assert dispatcher.released == [("email", ["<1@example.com>", "<2@example.com>"])]
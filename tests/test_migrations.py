@@ -0,0 +1,13 @@
+from app.repositories.migrations import MIGRATIONS_DIR, NO_TRANSACTION, _statements
+
+def test_concurrent_indexes_run_outside_a_transaction():
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        sql = path.read_text()
+        if "CONCURRENTLY" in sql:
+            assert sql.startswith(NO_TRANSACTION), path.name
+
+def test_no_transaction_file_splits_into_statements():
+    sql = (MIGRATIONS_DIR / "0006_concurrent_indexes.sql").read_text()
+    statements = _statements(sql)
+    assert len(statements) == 5
+    assert all(statement.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS") for statement in statements)
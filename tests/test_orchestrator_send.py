@@ -0,0 +1,68 @@
+import asyncio
+from app.adapters import whatsapp
+from app.adapters.whatsapp import WhatsAppAdapter
+from app.schemas.models import ReplyCallback
+from app.services.orchestrator import MessageOrchestrator
+
+def _orchestrator(monkeypatch, meta_results):
+    calls = iter(meta_results)
+
+    async def make_meta_request(method, url, token, payload):
+        return next(calls, {"success": True, "status_code": 200, "data": {}})
+
+    monkeypatch.setattr(whatsapp, "make_meta_request", make_meta_request)
+    adapter = WhatsAppAdapter()
+    adapter.token = "token"
+    return MessageOrchestrator(None, None, None, {"whatsapp": adapter})
+
+async def _events(*events):
+    for event in events:
+        yield event
+
+def test_failed_meta_send_is_reported(monkeypatch):
+    orchestrator = _orchestrator(monkeypatch, [{"success": False, "status_code": 400, "data": {}}])
+    reply = ReplyCallback(user_id="6281234567890", platform="whatsapp", answer="Halo")
+    assert asyncio.run(orchestrator.send_reply(reply)) == {"status": "failed"}
+
+def test_partial_meta_send_is_reported(monkeypatch):
+    orchestrator = _orchestrator(monkeypatch, [
+        {"success": True, "status_code": 200, "data": {}},
+        {"success": False, "error": "timeout"}
+    ])
+    reply = ReplyCallback(user_id="6281234567890", platform="whatsapp", answer="a" * 5000)
+    assert asyncio.run(orchestrator.send_reply(reply)) == {"status": "failed"}
+
+def test_successful_meta_send_is_reported(monkeypatch):
+    orchestrator = _orchestrator(monkeypatch, [])
+    reply = ReplyCallback(user_id="6281234567890", platform="whatsapp", answer="Halo")
+    assert asyncio.run(orchestrator.send_reply(reply)) == {"status": "sent"}
+
+def test_failed_stream_segment_is_reported(monkeypatch):
+    orchestrator = _orchestrator(monkeypatch, [{"success": False, "status_code": 500, "data": {}}])
+    events = _events(
+        {"user": "6281234567890", "platform": "whatsapp", "delta": "Paragraf pertama.\n\n"},
+        {"delta": "Paragraf kedua."}
+    )
+    result = asyncio.run(orchestrator.relay_stream(events, min_chars=1, max_chars=1000))
+    assert result["status"] == "failed"
+    assert result["failed_segments"] == 1
+    assert result["segments"] == 2
+
+def test_stream_header_answer_is_relayed(monkeypatch):
+    sent = []
+
+    async def make_meta_request(method, url, token, payload):
+        sent.append(payload["text"]["body"])
+        return {"success": True, "status_code": 200, "data": {}}
+
+    monkeypatch.setattr(whatsapp, "make_meta_request", make_meta_request)
+    adapter = WhatsAppAdapter()
+    adapter.token = "token"
+    orchestrator = MessageOrchestrator(None, None, None, {"whatsapp": adapter})
+    events = _events(
+        {"user": "6281234567890", "platform": "whatsapp", "answer": "Paragraf pertama.\n\n"},
+        {"delta": "Paragraf kedua."}
+    )
+    result = asyncio.run(orchestrator.relay_stream(events, min_chars=1, max_chars=1000))
+    assert result["status"] == "sent"
+    assert sent == ["Paragraf pertama.", "Paragraf kedua."]
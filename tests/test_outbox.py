@@ -0,0 +1,44 @@
+import asyncio
+from app.services.outbox import OutboxWorker
+
+class _Repo:
+    def __init__(self):
+        self.sent, self.released, self.failed = [], [], []
+
+    async def mark_sent(self, ids):
+        self.sent += ids
+
+    async def release(self, ids):
+        self.released += ids
+
+    async def mark_failed(self, ids, max_attempts, max_backoff_seconds, error):
+        self.failed += ids
+        return 0
+
+class _Chatbot:
+    def __init__(self, failing):
+        self.failing = failing
+        self.delivered = []
+
+    async def deliver(self, payload):
+        await asyncio.sleep(0)
+        if payload["query"] in self.failing:
+            return False
+        self.delivered.append(payload["query"])
+        return True
+
+def _row(row_id, user, query):
+    return (row_id, {"platform": "whatsapp", "platform_unique_id": user, "query": query}, 1)
+
+def test_batch_keeps_each_users_order_and_holds_back_after_a_failure():
+    repo, chatbot = _Repo(), _Chatbot(failing={"a2"})
+    worker = OutboxWorker(repo, chatbot, batch_size=10, poll_interval=1, lease_seconds=60, max_attempts=3, max_backoff_seconds=10)
+    rows = [_row(4, "a", "a3"), _row(1, "a", "a1"), _row(2, "b", "b1"), _row(3, "a", "a2"), _row(5, "b", "b2")]
+
+    asyncio.run(worker._deliver_batch(rows))
+
+    assert [query for query in chatbot.delivered if query.startswith("a")] == ["a1"]
+    assert [query for query in chatbot.delivered if query.startswith("b")] == ["b1", "b2"]
+    assert sorted(repo.sent) == [1, 2, 5]
+    assert repo.failed == [3]
+    assert repo.released == [4]
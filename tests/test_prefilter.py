@@ -0,0 +1,48 @@
+import orjson
+from app.services.prefilter import classify_whatsapp_body
+
+def _whatsapp_envelope(value: dict) -> bytes:
+    return orjson.dumps({
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "102290129340398",
+            "changes": [{"value": value, "field": "messages"}]
+        }]
+    })
+
+_METADATA = {"display_phone_number": "15550783881", "phone_number_id": "106540352242922"}
+
+def test_status_callback_is_dropped():
+    body = _whatsapp_envelope({
+        "messaging_product": "whatsapp",
+        "metadata": _METADATA,
+        "statuses": [{
+            "id": "wamid.HBgLMTY1MDM4Nzk0MzkVAgARGBJDQjZCMzlEQUE4OTJBMTE4RTUA",
+            "status": "delivered",
+            "timestamp": "1750263773",
+            "recipient_id": "16505551234",
+            "conversation": {"id": "6ceb9d929c1a3b5a5cd2a0de2a9c7d0e", "origin": {"type": "service"}},
+            "pricing": {"billable": True, "pricing_model": "CBP", "category": "service"}
+        }]
+    })
+    assert b'"field":"messages"' in body
+    assert classify_whatsapp_body(body) == "whatsapp_status"
+
+def test_user_message_is_parsed():
+    body = _whatsapp_envelope({
+        "messaging_product": "whatsapp",
+        "metadata": _METADATA,
+        "contacts": [{"profile": {"name": "Budi"}, "wa_id": "16505551234"}],
+        "messages": [{
+            "from": "16505551234",
+            "id": "wamid.HBgLMTY1MDUwNzY1MjAVAgASGBQzQUZCMTY0MDc2MUYwNzBDNTY5MAA=",
+            "timestamp": "1750263770",
+            "type": "text",
+            "text": {"body": 'halo, saya mau tanya "messages": statuses'}
+        }]
+    })
+    assert classify_whatsapp_body(body) is None
+
+def test_other_change_is_dropped():
+    body = _whatsapp_envelope({"messaging_product": "whatsapp", "metadata": _METADATA})
+    assert classify_whatsapp_body(body) == "whatsapp_other"
@@ -0,0 +1,16 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.api.routes import receive_backend_replies
+
+def _request(body: bytes) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    return Request({"type": "http", "method": "POST", "path": "/api/send/replies", "headers": []}, receive)
+
+@pytest.mark.parametrize("body", [b"{not json", b"", b'{"replies": 1}'])
+def test_bad_reply_batch_is_rejected(body):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(receive_backend_replies(_request(body), orchestrator=None))
+    assert exc.value.status_code == 422
@@ -0,0 +1,27 @@
+import asyncio
+from datetime import datetime, timezone
+from app.services.scheduler import SessionTimeoutScheduler
+from app.services.session_timer import SessionTimer
+
+class _Conversations:
+    def __init__(self, recent):
+        self.recent = recent
+        self.windows = []
+
+    async def get_recent_sessions(self, seconds, limit=200, after=None):
+        self.windows.append(seconds)
+        return self.recent
+
+def test_catch_up_arms_sessions_seen_by_other_workers():
+    last_activity = datetime.now(timezone.utc)
+    repo = _Conversations([("conv-1", "whatsapp", "6281234567890", last_activity)])
+    timer = SessionTimer(timeout_seconds=900)
+    timer.activate()
+    scheduler = SessionTimeoutScheduler(repo, None, 15, 1, 50, {}, timer=timer, catch_up_interval=10)
+
+    assert asyncio.run(scheduler.catch_up()) == 1
+    assert timer.wheel.deadline("conv-1") == last_activity.timestamp() + 900
+
+    # The next window only reaches back to the previous scan, plus one interval of overlap.
+    asyncio.run(scheduler.catch_up())
+    assert 10 <= repo.windows[1] < 11
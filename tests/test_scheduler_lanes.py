@@ -0,0 +1,47 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import SessionTimeoutScheduler
+
+class _Conversations:
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    async def get_stale_sessions(self, minutes=15, limit=50, after=None, platform=None):
+        rows = [row for row in self.sessions if platform in (None, row[1]) and (after is None or (row[3], row[0]) > after)]
+        return sorted(rows, key=lambda row: (row[3], row[0]))[:limit]
+
+class _Orchestrator:
+    def __init__(self):
+        self.finished = {}
+
+    async def timeout_session(self, conversation_id, platform, user_id):
+        await asyncio.sleep(0.01)
+        self.finished[conversation_id] = time.monotonic()
+
+def _sessions(platform, count):
+    base = datetime.now(timezone.utc) - timedelta(hours=1)
+    return [(f"{platform}-{i:03d}", platform, f"user-{i}", base + timedelta(seconds=i)) for i in range(count)]
+
+def test_slow_platform_does_not_starve_the_other(monkeypatch):
+    orchestrator = _Orchestrator()
+    monkeypatch.setattr(scheduler_module, "get_orchestrator", lambda: orchestrator)
+    repo = _Conversations(_sessions("instagram", 20) + _sessions("whatsapp", 20))
+    scheduler = SessionTimeoutScheduler(repo, None, 15, 2, 5, {"whatsapp": 0, "instagram": 10})
+
+    async def scenario():
+        started = time.monotonic()
+        pass_task = asyncio.create_task(scheduler.run_pass())
+        await asyncio.sleep(0.5)
+        whatsapp_done = sum(1 for key in orchestrator.finished if key.startswith("whatsapp"))
+        instagram_done = sum(1 for key in orchestrator.finished if key.startswith("instagram"))
+        assert await pass_task == 40
+        return whatsapp_done, instagram_done, time.monotonic() - started
+
+    whatsapp_done, instagram_done, elapsed = asyncio.run(scenario())
+    # WhatsApp is unpaced and finishes while Instagram is still paced at 10/s after its burst.
+    assert whatsapp_done == 20
+    assert instagram_done < 20
+    assert scheduler.timed_out == 40
+    assert elapsed >= 0.9
@@ -0,0 +1,108 @@
+import asyncio
+import math
+import random
+import time
+from datetime import datetime, timezone
+from app.services.scheduler import SessionTimeoutScheduler
+from app.services.session_timer import SessionTimer, TimerWheel
+
+START = 1_000_000.0
+DAY = 24 * 3600
+
+def _run(wheel, until, step=1.0):
+    fired = {}
+    now = START
+    while now < until:
+        now += step
+        for key, _ in wheel.advance(now):
+            assert key not in fired
+            fired[key] = now
+    return fired
+
+def test_randomized_timers_fire_on_time():
+    rng = random.Random(7)
+    wheel = TimerWheel(tick=1.0, now=START)
+    expected = {}
+    for key in range(5000):
+        span = rng.choice((70, 4000, 3 * DAY))
+        expected[key] = START + rng.uniform(0, span)
+        wheel.schedule(key, expected[key], key)
+    for key in range(0, 5000, 7):
+        wheel.cancel(key)
+        del expected[key]
+    for key in range(1, 5000, 11):
+        if key in expected:
+            expected[key] = max(START, expected[key] + rng.uniform(-50, 5000))
+            wheel.schedule(key, expected[key], key)
+
+    fired = _run(wheel, START + 3 * DAY + 6000)
+
+    assert fired.keys() == expected.keys()
+    for key, deadline in expected.items():
+        # Never early, and at most one tick late.
+        assert deadline <= fired[key] <= max(math.ceil(deadline), START + 1)
+    assert len(wheel) == 0
+
+def test_cancelled_timer_never_fires_and_rearm_replaces_it():
+    wheel = TimerWheel(tick=1.0, now=START)
+    wheel.schedule("a", START + 30, "first")
+    wheel.schedule("b", START + 30)
+    assert wheel.cancel("b")
+    assert not wheel.cancel("b")
+    wheel.schedule("a", START + 90, "second")
+    assert wheel.deadline("a") == START + 90
+
+    assert wheel.advance(START + 89) == []
+    assert wheel.advance(START + 90) == [("a", "second")]
+    assert wheel.advance(START + 500) == []
+
+    # Re-armed to an earlier deadline it fires at the earlier one.
+    wheel.schedule("c", START + 4000)
+    wheel.schedule("c", START + 600)
+    assert wheel.advance(START + 600) == [("c", None)]
+
+def test_timers_beyond_the_top_level_span():
+    wheel = TimerWheel(tick=1.0, slots=(60, 60, 24), now=START)
+    deadlines = {"one-day": START + DAY + 0.5, "three-days": START + 3 * DAY + 17.25, "week": START + 7 * DAY}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+
+    fired = _run(wheel, START + 8 * DAY, step=7.0)
+
+    for key, deadline in deadlines.items():
+        # Advanced in 7s steps, so each fires on the first step at or after its deadline.
+        assert deadline <= fired[key] < deadline + 7.0 + 1.0
+
+def test_past_deadline_fires_on_the_next_tick():
+    wheel = TimerWheel(tick=1.0, now=START)
+    wheel.schedule("late", START - 100)
+    assert wheel.advance(START) == []
+    assert wheel.advance(START + 1) == [("late", None)]
+
+class _FailingOrchestrator:
+    def __init__(self):
+        self.calls = 0
+
+    async def timeout_session(self, conversation_id, platform, user_id):
+        self.calls += 1
+        raise ConnectionError("backend down")
+
+def test_failed_timeout_is_retried_after_the_retry_delay():
+    timer = SessionTimer(timeout_seconds=900)
+    timer.activate()
+    scheduler = SessionTimeoutScheduler(None, None, 15, 1, 50, {}, timer=timer, retry_delay=30)
+
+    orchestrator = _FailingOrchestrator()
+
+    async def scenario():
+        await scheduler._slots.acquire()
+        await scheduler._spawn(orchestrator, ("conv-1", "whatsapp", "6281234567890", datetime.now(timezone.utc)))
+
+    before = time.time()
+    asyncio.run(scenario())
+    assert orchestrator.calls == 1
+    assert scheduler.failed == 1
+    assert before + 30 <= timer.wheel.deadline("conv-1") <= time.time() + 30
+    # A rebuild from the DB does not pull the retry back in.
+    timer.arm("conv-1", "whatsapp", "6281234567890", before - 3600)
+    assert timer.wheel.deadline("conv-1") >= before + 30
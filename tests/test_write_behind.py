@@ -0,0 +1,129 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+from app.core.exceptions import DatabaseError
+from app.repositories import write_behind
+from app.repositories.write_behind import WriteBehindBuffer
+
+class _Cursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params):
+        self.db.statements.append(params)
+        if any("bad" in str(value) for value in params):
+            raise ValueError("bad row")
+        if "processed_messages" in sql:
+            keys = list(zip(*params))
+            self.rows = [key for key in keys if key not in self.db.claimed]
+            self.db.claimed.update(self.rows)
+
+    async def fetchall(self):
+        return self.rows
+
+class _Connection:
+    def __init__(self, db):
+        self.db = db
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    def cursor(self):
+        return _Cursor(self.db)
+
+class _Database:
+    def __init__(self, down=False):
+        self.down = down
+        self.statements = []
+        self.claimed = set()
+
+    @asynccontextmanager
+    async def get_connection(self):
+        if self.down:
+            raise ConnectionError("database down")
+        yield _Connection(self)
+
+@pytest.fixture
+def database(monkeypatch):
+    db = _Database()
+    monkeypatch.setattr(write_behind.Database, "get_connection", db.get_connection)
+    return db
+
+async def _flushed(buffer, *writes):
+    buffer.start()
+    futures = [buffer.submit(kind, payload) for kind, payload in writes]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    await buffer.stop()
+    return results
+
+def test_one_batch_claim_is_split_between_callers(database):
+    database.claimed.add(("m0", "whatsapp"))
+    buffer = WriteBehindBuffer(max_rows=100, max_delay=0.01)
+    first, second = asyncio.run(_flushed(
+        buffer,
+        ("claim", ("whatsapp", ["m0", "m1", "m2"])),
+        ("claim", ("whatsapp", ["m2", "m3"]))
+    ))
+    # m0 was already processed, and m2 goes to the first caller that asked for it.
+    assert first == {"m1", "m2"}
+    assert second == {"m3"}
+    assert len(database.statements) == 1
+
+def test_failing_batch_is_retried_row_by_row(database):
+    buffer = WriteBehindBuffer(max_rows=100, max_delay=0.01)
+    results = asyncio.run(_flushed(
+        buffer,
+        ("claim", ("whatsapp", ["m1"])),
+        ("claim", ("whatsapp", ["bad"])),
+        ("email", ("conv-1", "subject", "", "", "thread-1")),
+        ("email", ("conv-2", "bad", "", "", "thread-2")),
+        ("close", "conv-3")
+    ))
+    assert results[0] == {"m1"}
+    assert isinstance(results[1], DatabaseError)
+    assert results[2] is True
+    assert results[3] is False
+    assert results[4] is None
+    assert buffer.row_retries == 2
+
+def test_failed_flush_returns_each_kinds_failure_value(monkeypatch):
+    db = _Database(down=True)
+    monkeypatch.setattr(write_behind.Database, "get_connection", db.get_connection)
+    buffer = WriteBehindBuffer(max_rows=100, max_delay=0.01)
+    claim, email, touch, close = asyncio.run(_flushed(
+        buffer,
+        ("claim", ("whatsapp", ["m1"])),
+        ("email", ("conv-1", "subject", "", "", "thread-1")),
+        ("touch", ["conv-1"]),
+        ("close", "conv-1")
+    ))
+    assert isinstance(claim, DatabaseError)
+    assert email is False
+    assert touch is None
+    assert close is None
+
+def test_writes_do_not_hang_when_the_flush_task_dies(database, monkeypatch):
+    async def crash(self, batch):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(WriteBehindBuffer, "_flush", crash)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(max_rows=100, max_delay=0.01)
+        buffer.start()
+        pending = buffer.submit("close", "conv-1")
+        assert await asyncio.wait_for(pending, 1) is None
+        assert not buffer.running
+        late = buffer.submit("claim", ("whatsapp", ["m1"]))
+        with pytest.raises(DatabaseError):
+            await asyncio.wait_for(late, 1)
+
+    asyncio.run(scenario())